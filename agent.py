@@ -7,7 +7,7 @@ from typing import List, Dict
 
 # Local imports
 from agent_state import GraphState
-from tools.llm_client import setup_llm
+from tools.llm_client import setup_llm, setup_validator_llm
 from tools.neo4j_client import Neo4jClient
 from nodes.cypher_generator import CypherGeneratorNode
 from nodes.cypher_validator import CypherValidatorNode
@@ -26,8 +26,10 @@ class Text2CypherAgent:
     It initializes all components, builds the graph, and provides a run method.
     """
 
-    def __init__(self, feedback_examples: List[Dict], model_name="gpt-4o", prompt_template: str = None, examples_file_path: str = "examples.json", summarizer_type: str = "llm", run_mode: str = "standard"):
+    def __init__(self, feedback_examples: List[Dict], model_name="gpt-4o", prompt_template: str = None, examples_file_path: str = "examples.json", summarizer_type: str = "llm", run_mode: str = "standard", validator_model_name: str = "gpt-4o-mini"):
         self.llm = setup_llm(model_name)
+        # The validator only answers 'valid'/'invalid', so a small, output-constrained model is enough
+        self.validator_llm = setup_validator_llm(validator_model_name)
         self.neo4j_client = Neo4jClient()
         self.db_schema = self.neo4j_client.get_schema()
         self.run_mode = run_mode
@@ -36,7 +38,7 @@ class Text2CypherAgent:
         self.prompt_manager = PromptManager(feedback_examples, prompt_template, examples_file_path)
 
         self.cypher_generator_node = CypherGeneratorNode(self.llm, self.prompt_manager)
-        self.cypher_validator_node = CypherValidatorNode(self.llm, self.db_schema)
+        self.cypher_validator_node = CypherValidatorNode(self.validator_llm, self.db_schema)
         self.query_executor_node = QueryExecutorNode(self.neo4j_client)
         
         if summarizer_type == "llm":
@@ -1,4 +1,4 @@
-from typing import TypedDict, Annotated
+from typing import TypedDict, Annotated, Any
 from langgraph.graph.message import add_messages
 
 
@@ -10,11 +10,13 @@ class GraphState(TypedDict):
         messages: The history of messages in the conversation.
         generation: The last generated Cypher query.
         retries: The number of times the agent has tried to generate a valid query.
+        raw_result: The Python object returned by the last successful query execution.
         validation_result: The result from the syntax validation node.
         summary: The final natural language summary of the result.
     """
     messages: Annotated[list, add_messages]
     generation: str
     retries: int
+    raw_result: Any
     validation_result: str
     summary: str
@@ -35,7 +35,8 @@ def create_agent(run_mode=None):
         new_agent = Text2CypherAgent(
             summarizer_type=summarizer_choice,
             feedback_examples=feedback_examples,
-            run_mode=agent_run_mode
+            run_mode=agent_run_mode,
+            validator_model_name=os.environ.get("VALIDATOR_MODEL", "gpt-4o-mini")
         )
         print(f"--- Agent Initialized Successfully (Summarizer: {summarizer_choice}, Run Mode: {agent_run_mode}, Feedback examples: {len(feedback_examples)}) ---")
         return new_agent
@@ -226,6 +226,7 @@ class ConfigManager:
         env_template = """# OpenAI 配置
 OPENAI_API_KEY=your_openai_api_key_here
 OPENAI_MODEL=gpt-4o
+VALIDATOR_MODEL=gpt-4o-mini
 OPENAI_TEMPERATURE=0
 OPENAI_MAX_TOKENS=4000
 
@@ -274,6 +275,9 @@ EMBEDDING_DIMENSIONS=1536
 SIMILARITY_THRESHOLD=0.7
 MAX_EXAMPLES=5
 MAX_FEEDBACK=3
+USE_VECTOR_INDEX=true
+VECTOR_INDEX_MIN_CANDIDATES=10000
+VECTOR_QUANTIZATION=none
 
 # 日志配置
 LOG_LEVEL=INFO
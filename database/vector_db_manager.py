@@ -1,7 +1,9 @@
 import sqlite3
-import json
-from typing import List, Dict, Optional
-from tools.embedding_client import EmbeddingClient
+import time
+import numpy as np
+import orjson
+from typing import List, Dict, Optional, Tuple
+from tools.embedding_client import get_embedding_client
 
 
 class VectorDBManager:
@@ -9,10 +11,32 @@ class VectorDBManager:
     Enhanced database manager with vector embedding capabilities.
     """
 
-    def __init__(self, db_path: str = "feedback.db"):
-        """Initialize the vector database manager."""
+    def __init__(self, db_path: str = "feedback.db", use_vector_index: bool = True,
+                 vector_index_min_candidates: int = 10000, vector_quantization: str = "none"):
+        """
+        Initialize the vector database manager.
+
+        Args:
+            db_path: SQLite database path
+            use_vector_index: Search collections of at least vector_index_min_candidates rows through an HNSW index
+            vector_index_min_candidates: Collection size from which the HNSW index is used
+            vector_quantization: "int8" scans a scalar-quantized copy of the candidates, "none" the float32 matrix
+        """
         self.db_path = db_path
-        self.embedding_client = EmbeddingClient()
+        # Shared client: every VectorDBManager in the process uses the same embedding cache
+        self.embedding_client = get_embedding_client()
+        # text_type -> ((row count, max id), (rows, embedding matrix, row norms))
+        self._candidate_cache = {}
+        # Large collections are searched through an HNSW index instead of a brute-force scan
+        self.use_vector_index = use_vector_index
+        self.vector_index_min_candidates = vector_index_min_candidates
+        # "int8" scans a scalar-quantized copy of the candidates instead of the float32 matrix
+        self.vector_quantization = vector_quantization.lower()
+        # (text_type, index kind) -> (embedding matrix the index was built from, faiss index)
+        self._ann_cache = {}
+        # text_type (None for all types) -> (expires_at, row count)
+        self._count_cache = {}
+        self.count_ttl = 60
         self._create_vector_tables()
 
     def _create_vector_tables(self):
@@ -67,126 +91,311 @@ class VectorDBManager:
                        cypher_query: str = None, similarity_threshold: float = 0.8):
         """Store text and its embedding in the database."""
         embedding = self.embedding_client.get_embedding(text_content, use_cache=True)
-        if not embedding:
+        if len(embedding) == 0:
             return False
 
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("""
+                INSERT INTO vector_embeddings (text_type, text_content, cypher_query, embedding_data, similarity_threshold)
+                VALUES (?, ?, ?, ?, ?)
+            """, (text_type, text_content, cypher_query, orjson.dumps(embedding, option=orjson.OPT_SERIALIZE_NUMPY).decode(), similarity_threshold))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error storing embedding: {e}")
+            return False
+        finally:
+            conn.close()
+        # The collection is no longer empty
+        self._count_cache.pop(text_type, None)
+        self._count_cache.pop(None, None)
+        return True
+
+    def store_embeddings_batch(self, text_type: str, items: List[Tuple[str, Optional[str]]],
+                               similarity_threshold: float = 0.8) -> int:
+        """
+        Store many texts at once: embeddings are requested in concurrent batches
+        and all rows are written in a single transaction. A failed batch request turns
+        its whole chunk into missing rows, so those texts are retried one at a time and
+        only the texts that still cannot be embedded are skipped.
+
+        Args:
+            text_type: Collection to store into ('example' or 'feedback')
+            items: (text_content, cypher_query) pairs
+            similarity_threshold: Threshold stored with every row
+
+        Returns:
+            int: Number of rows stored (0 if the database write fails)
+        """
+        if not items:
+            return 0
+        texts = [text for text, _ in items]
+        embeddings = list(self.embedding_client.get_embeddings_batch(texts, use_cache=True))
+
+        failed = [i for i, embedding in enumerate(embeddings) if embedding.size == 0 or np.isnan(embedding).any()]
+        if failed:
+            print(f"Warning: Retrying {len(failed)} {text_type} texts one at a time after a failed batch request")
+            for i in failed:
+                embeddings[i] = self.embedding_client.get_embedding(texts[i], use_cache=True)
+
+        rows = [
+            (text_type, text_content, cypher_query,
+             orjson.dumps(embedding, option=orjson.OPT_SERIALIZE_NUMPY).decode(), similarity_threshold)
+            for (text_content, cypher_query), embedding in zip(items, embeddings)
+            if embedding.size and not np.isnan(embedding).any()
+        ]
+        if len(rows) < len(items):
+            print(f"Warning: Skipped {len(items) - len(rows)} {text_type} texts that could not be embedded")
+        if not rows:
+            return 0
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.executemany("""
+                INSERT INTO vector_embeddings (text_type, text_content, cypher_query, embedding_data, similarity_threshold)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error storing embeddings: {e}")
+            return 0
+        finally:
+            conn.close()
+        self._count_cache.pop(text_type, None)
+        self._count_cache.pop(None, None)
+        return len(rows)
+
+    def count(self, text_type: str = None) -> int:
+        """
+        Number of stored embeddings of a type (or of all types), cached for count_ttl seconds.
+        Lets callers skip embedding the question when there is nothing to search.
+        """
+        cached = self._count_cache.get(text_type)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            if text_type is None:
+                row = conn.execute("SELECT COUNT(*) FROM vector_embeddings").fetchone()
+            else:
+                row = conn.execute("SELECT COUNT(*) FROM vector_embeddings WHERE text_type = ?",
+                                   (text_type,)).fetchone()
+        finally:
+            conn.close()
+
+        self._count_cache[text_type] = (time.monotonic() + self.count_ttl, row[0])
+        return row[0]
+
+    def _load_candidates(self, text_type: str) -> Tuple[List[tuple], np.ndarray, np.ndarray]:
+        """
+        Load stored rows of one type together with their embeddings stacked into one
+        (N, d) float32 matrix and the matrix's row norms.
+
+        Returns:
+            Tuple: (rows of (text_content, cypher_query, similarity_threshold), matrix, norms)
+        """
+        return self._load_candidates_multi([text_type])[text_type]
+
+    def _load_candidates_multi(self, text_types: List[str]) -> Dict[str, Tuple[List[tuple], np.ndarray, np.ndarray]]:
+        """
+        Load candidates for several text types with one version query and at most one
+        data query.
+
+        The parsed matrices are cached and only rebuilt when rows of a type are added or
+        removed, so a warm lookup costs one aggregate query instead of re-parsing every embedding.
+
+        Returns:
+            Dict: text_type -> (rows, matrix, norms) as returned by _load_candidates
+        """
+        placeholders = ", ".join("?" for _ in text_types)
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
-        cursor.execute("""
-            INSERT INTO vector_embeddings (text_type, text_content, cypher_query, embedding_data, similarity_threshold)
-            VALUES (?, ?, ?, ?, ?)
-        """, (text_type, text_content, cypher_query, json.dumps(embedding), similarity_threshold))
+        cursor.execute(f"""
+            SELECT text_type, COUNT(*), MAX(id) FROM vector_embeddings
+            WHERE text_type IN ({placeholders})
+            GROUP BY text_type
+        """, text_types)
+        versions = {text_type: (count, max_id) for text_type, count, max_id in cursor.fetchall()}
+
+        result = {}
+        stale_types = []
+        for text_type in text_types:
+            version = versions.get(text_type, (0, None))
+            cached = self._candidate_cache.get(text_type)
+            if cached is not None and cached[0] == version:
+                result[text_type] = cached[1]
+            else:
+                stale_types.append(text_type)
+
+        if stale_types:
+            stale_placeholders = ", ".join("?" for _ in stale_types)
+            cursor.execute(f"""
+                SELECT text_type, text_content, cypher_query, embedding_data, similarity_threshold
+                FROM vector_embeddings
+                WHERE text_type IN ({stale_placeholders})
+            """, stale_types)
+            rows_by_type = {text_type: [] for text_type in stale_types}
+            for text_type, text_content, cypher_query, embedding_data, threshold in cursor.fetchall():
+                rows_by_type[text_type].append((text_content, cypher_query, embedding_data, threshold))
+
+            for text_type, rows in rows_by_type.items():
+                candidates = self._stack_embeddings(
+                    [(text_content, cypher_query, threshold)
+                     for text_content, cypher_query, _, threshold in rows],
+                    [orjson.loads(embedding_data) for _, _, embedding_data, _ in rows])
+                self._candidate_cache[text_type] = (versions.get(text_type, (0, None)), candidates)
+                result[text_type] = candidates
 
-        conn.commit()
         conn.close()
-        return True
+        return result
+
+    @staticmethod
+    def _stack_embeddings(metadata: List[tuple],
+                          embeddings: List[List[float]]) -> Tuple[List[tuple], np.ndarray, np.ndarray]:
+        """Stack embeddings into a float32 matrix, skipping vectors whose dimension differs."""
+        dim = len(embeddings[0]) if embeddings else 0
+        kept = [i for i, emb in enumerate(embeddings) if emb and len(emb) == dim]
+        if not kept:
+            return [], np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=np.float32)
+
+        matrix = np.array([embeddings[i] for i in kept], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1)
+        return [metadata[i] for i in kept], matrix, norms
+
+    def _get_ann_index(self, text_type: str, matrix: np.ndarray, norms: np.ndarray,
+                       kind: str = 'hnsw'):
+        """Return the 'hnsw' or 'int8' index for a text type, rebuilding it when the candidate matrix changed."""
+        cached = self._ann_cache.get((text_type, kind))
+        if cached is not None and cached[0] is matrix:
+            return cached[1]
+        if kind == 'int8':
+            index = self.embedding_client.build_quantized_index(matrix, norms)
+        else:
+            index = self.embedding_client.build_ann_index(matrix, norms)
+        self._ann_cache[(text_type, kind)] = (matrix, index)
+        return index
+
+    def _rank_candidates(self, text_type: str,
+                         candidates: Tuple[List[tuple], np.ndarray, np.ndarray],
+                         query_embedding: List[float], top_k: int,
+                         min_similarity: float, method: str,
+                         include_threshold: bool) -> List[Dict]:
+        """Score stored candidates against a query embedding and return the top_k above min_similarity."""
+        rows, matrix, norms = candidates
+        if not rows:
+            return []
+
+        if (self.use_vector_index and method in ('cosine', 'dot_product')
+                and len(rows) >= self.vector_index_min_candidates):
+            # Large collections: approximate nearest neighbours from the HNSW index
+            index = self._get_ann_index(text_type, matrix, norms)
+            ranked = self.embedding_client.search_ann_index(index, query_embedding, top_k)
+        elif self.vector_quantization == 'int8' and method in ('cosine', 'dot_product'):
+            # Exhaustive scan over int8 codes: a quarter of the bytes of the float32 matrix
+            index = self._get_ann_index(text_type, matrix, norms, kind='int8')
+            ranked = self.embedding_client.search_ann_index(index, query_embedding, top_k)
+        else:
+            # Score every candidate in one vectorized pass
+            scores = self.embedding_client.score_candidates(
+                query_embedding, matrix, method=method, candidate_norms=norms)
+            top_indices = self.embedding_client.top_k_indices(scores, top_k)
+            ranked = zip(top_indices.tolist(), scores[top_indices].tolist())
+
+        # Sort by similarity and return top_k
+        similarities = []
+        for i, similarity in ranked:
+            if similarity < min_similarity or len(similarities) >= top_k:
+                break
+            text_content, cypher_query, threshold = rows[i]
+            match = {
+                'text_content': text_content,
+                'cypher_query': cypher_query,
+                'similarity': similarity
+            }
+            if include_threshold:
+                match['threshold'] = threshold
+            similarities.append(match)
+        return similarities
 
     def find_similar_examples(self, query: str, top_k: int = 5,
                              min_similarity: float = 0.7,
                              method: str = 'cosine') -> List[Dict]:
         """Find similar examples based on semantic similarity."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT text_content, cypher_query, embedding_data, similarity_threshold
-            FROM vector_embeddings
-            WHERE text_type = 'example'
-        """)
-        rows = cursor.fetchall()
-
-        if not rows:
+        candidates = self._load_candidates('example')
+        if not candidates[0]:
             return []
 
         # Get query embedding
         query_embedding = self.embedding_client.get_embedding(query, use_cache=True)
-        if not query_embedding:
+        if len(query_embedding) == 0:
             return []
 
-        # Extract stored embeddings for batch processing
-        stored_embeddings = []
-        metadata = []
-        
-        for row in rows:
-            text_content, cypher_query, embedding_data, threshold = row
-            stored_embedding = json.loads(embedding_data)
-            stored_embeddings.append(stored_embedding)
-            metadata.append({
-                'text_content': text_content,
-                'cypher_query': cypher_query,
-                'threshold': threshold
-            })
+        return self._rank_candidates('example', candidates, query_embedding, top_k,
+                                     min_similarity, method, include_threshold=True)
 
-        # Use batch similarity calculation for better performance
-        similarities = []
-        for i, stored_embedding in enumerate(stored_embeddings):
-            similarity = self.embedding_client.calculate_similarity(
-                query_embedding, stored_embedding, method=method)
-            
-            if similarity >= min_similarity:
-                similarities.append({
-                    'text_content': metadata[i]['text_content'],
-                    'cypher_query': metadata[i]['cypher_query'],
-                    'similarity': similarity,
-                    'threshold': metadata[i]['threshold']
-                })
-
-        # Sort by similarity and return top_k
-        similarities.sort(key=lambda x: x['similarity'], reverse=True)
-        return similarities[:top_k]
+    def find_similar_examples_by_vector(self, query_embedding: List[float], top_k: int = 5,
+                                        min_similarity: float = 0.7,
+                                        method: str = 'cosine') -> List[Dict]:
+        """Find similar examples for an already computed query embedding."""
+        if len(query_embedding) == 0:
+            return []
+        candidates = self._load_candidates('example')
+        return self._rank_candidates('example', candidates, query_embedding, top_k,
+                                     min_similarity, method, include_threshold=True)
 
     def find_similar_feedback(self, query: str, top_k: int = 3,
                              min_similarity: float = 0.8,
                              method: str = 'cosine') -> List[Dict]:
         """Find similar feedback based on semantic similarity."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT text_content, cypher_query, embedding_data
-            FROM vector_embeddings 
-            WHERE text_type = 'feedback'
-        """)
-        rows = cursor.fetchall()
-
-        if not rows:
+        candidates = self._load_candidates('feedback')
+        if not candidates[0]:
             return []
 
         # Get query embedding
         query_embedding = self.embedding_client.get_embedding(query, use_cache=True)
-        if not query_embedding:
+        if len(query_embedding) == 0:
             return []
 
-        # Extract stored embeddings for batch processing
-        stored_embeddings = []
-        metadata = []
-        
-        for row in rows:
-            text_content, cypher_query, embedding_data = row
-            stored_embedding = json.loads(embedding_data)
-            stored_embeddings.append(stored_embedding)
-            metadata.append({
-                'text_content': text_content,
-                'cypher_query': cypher_query
-            })
-
-        # Use batch similarity calculation for better performance
-        similarities = []
-        for i, stored_embedding in enumerate(stored_embeddings):
-            similarity = self.embedding_client.calculate_similarity(
-                query_embedding, stored_embedding, method=method)
-            
-            if similarity >= min_similarity:
-                similarities.append({
-                    'text_content': metadata[i]['text_content'],
-                    'cypher_query': metadata[i]['cypher_query'],
-                    'similarity': similarity
-                })
+        return self._rank_candidates('feedback', candidates, query_embedding, top_k,
+                                     min_similarity, method, include_threshold=False)
 
-        # Sort by similarity and return top_k
-        similarities.sort(key=lambda x: x['similarity'], reverse=True)
-        return similarities[:top_k]
+    def find_similar_feedback_by_vector(self, query_embedding: List[float], top_k: int = 3,
+                                        min_similarity: float = 0.8,
+                                        method: str = 'cosine') -> List[Dict]:
+        """Find similar feedback for an already computed query embedding."""
+        if len(query_embedding) == 0:
+            return []
+        candidates = self._load_candidates('feedback')
+        return self._rank_candidates('feedback', candidates, query_embedding, top_k,
+                                     min_similarity, method, include_threshold=False)
+
+    def find_similar_multi(self, query_embedding: List[float],
+                           collections: List[Tuple[str, float, int]] = (('example', 0.7, 5), ('feedback', 0.8, 3)),
+                           method: str = 'cosine') -> Dict[str, List[Dict]]:
+        """
+        Search several collections with the same query embedding in one database round trip.
+
+        Args:
+            query_embedding: Precomputed query embedding
+            collections: (text_type, min_similarity, top_k) for each collection to search
+            method: Similarity method
+
+        Returns:
+            Dict[str, List[Dict]]: text_type -> matches, in the format of find_similar_examples
+            (examples) and find_similar_feedback (other types)
+        """
+        if len(query_embedding) == 0:
+            return {text_type: [] for text_type, _, _ in collections}
+
+        candidates_by_type = self._load_candidates_multi([text_type for text_type, _, _ in collections])
+        return {
+            text_type: self._rank_candidates(text_type, candidates_by_type[text_type], query_embedding,
+                                             top_k, min_similarity, method,
+                                             include_threshold=text_type == 'example')
+            for text_type, min_similarity, top_k in collections
+        }
 
     def cache_query_result(self, question: str, generated_cypher: str,
                           final_summary: str, similarity_score: float = None):
@@ -196,7 +405,7 @@ class VectorDBManager:
 
         # Get embedding for the question
         embedding = self.embedding_client.get_embedding(question, use_cache=True)
-        if not embedding:
+        if len(embedding) == 0:
             return False
 
         conn = sqlite3.connect(self.db_path)
@@ -225,7 +434,7 @@ class VectorDBManager:
                  embedding_data, similarity_score)
                 VALUES (?, ?, ?, ?, ?, ?)
             """, (question_hash, question, generated_cypher, final_summary,
-                  json.dumps(embedding), similarity_score))
+                  orjson.dumps(embedding, option=orjson.OPT_SERIALIZE_NUMPY).decode(), similarity_score))
 
         conn.commit()
         conn.close()
@@ -242,47 +451,38 @@ class VectorDBManager:
             FROM query_cache
         """)
         rows = cursor.fetchall()
+        conn.close()
 
         if not rows:
             return None
 
         # Get query embedding
         query_embedding = self.embedding_client.get_embedding(question, use_cache=True)
-        if not query_embedding:
+        if len(query_embedding) == 0:
             return None
 
-        # Extract stored embeddings for batch processing
-        stored_embeddings = []
-        metadata = []
-        
-        for row in rows:
-            cached_question, generated_cypher, final_summary, embedding_data, _ = row
-            stored_embedding = json.loads(embedding_data)
-            stored_embeddings.append(stored_embedding)
-            metadata.append({
-                'question': cached_question,
-                'generated_cypher': generated_cypher,
-                'final_summary': final_summary
-            })
-
-        # Find most similar cached result using optimized search
-        best_match = None
-        best_similarity = 0
-
-        for i, stored_embedding in enumerate(stored_embeddings):
-            similarity = self.embedding_client.calculate_similarity(
-                query_embedding, stored_embedding, method=method)
+        rows, matrix, norms = self._stack_embeddings(
+            [(cached_question, generated_cypher, final_summary)
+             for cached_question, generated_cypher, final_summary, _, _ in rows],
+            [orjson.loads(embedding_data) for _, _, _, embedding_data, _ in rows])
+        if not rows:
+            return None
 
-            if similarity >= min_similarity and similarity > best_similarity:
-                best_similarity = similarity
-                best_match = {
-                    'question': metadata[i]['question'],
-                    'generated_cypher': metadata[i]['generated_cypher'],
-                    'final_summary': metadata[i]['final_summary'],
-                    'similarity': similarity
-                }
+        # Find most similar cached result with one vectorized scoring pass
+        scores = self.embedding_client.score_candidates(
+            query_embedding, matrix, method=method, candidate_norms=norms)
+        best = int(np.argmax(scores))
+        best_similarity = float(scores[best])
+        if best_similarity < min_similarity or best_similarity <= 0:
+            return None
 
-        return best_match
+        cached_question, generated_cypher, final_summary = rows[best]
+        return {
+            'question': cached_question,
+            'generated_cypher': generated_cypher,
+            'final_summary': final_summary,
+            'similarity': best_similarity
+        }
 
     def get_cache_stats(self) -> Dict:
         """Get statistics about the query cache."""
@@ -328,14 +528,11 @@ class VectorDBManager:
 
         # Load existing examples and create embeddings
         examples = self.load_feedback_as_examples()
-        for example in examples:
-            text_content = example['natural_language']
-            cypher_query = example['cypher']
+        # Embedded in concurrent batches rather than one request per example
+        stored = self.store_embeddings_batch('example', [(example['natural_language'], example['cypher'])
+                                                        for example in examples])
 
-            # Store as example embedding
-            self.store_embedding('example', text_content, cypher_query)
-
-        print(f"--- Stored {len(examples)} example embeddings ---")
+        print(f"--- Stored {stored} of {len(examples)} example embeddings ---")
 
         # Load existing feedback and create embeddings
         conn = sqlite3.connect(self.db_path)
@@ -344,13 +541,10 @@ class VectorDBManager:
             SELECT question, correct_cypher FROM feedback WHERE rating > 3
         """)
         feedback_rows = cursor.fetchall()
-
-        for row in feedback_rows:
-            question, correct_cypher = row
-            self.store_embedding('feedback', question, correct_cypher)
-
         conn.close()
-        print(f"--- Stored {len(feedback_rows)} feedback embeddings ---")
+
+        stored = self.store_embeddings_batch('feedback', feedback_rows)
+        print(f"--- Stored {stored} of {len(feedback_rows)} feedback embeddings ---")
 
     def load_feedback_as_examples(self) -> List[Dict]:
         """Load high-rated feedback as examples."""
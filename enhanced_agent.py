@@ -7,7 +7,7 @@ from typing import List, Dict
 
 # Local imports
 from agent_state import GraphState
-from tools.llm_client import setup_llm
+from tools.llm_client import setup_llm, setup_validator_llm
 from tools.neo4j_client import Neo4jClient
 from database.vector_db_manager import VectorDBManager
 from prompts.enhanced_prompt_manager import EnhancedPromptManager
@@ -30,9 +30,12 @@ class EnhancedText2CypherAgent:
                  prompt_template: str = None, examples_file_path: str = "examples.json",
                  summarizer_type: str = "llm", run_mode: str = "standard",
                  enable_cache: bool = True, enable_embeddings: bool = True,
-                 similarity_method: str = 'cosine'):
+                 similarity_method: str = 'cosine', validator_model_name: str = "gpt-4o-mini",
+                 vector_db_manager: VectorDBManager = None):
 
         self.llm = setup_llm(model_name)
+        # The validator only answers 'valid'/'invalid', so a small, output-constrained model is enough
+        self.validator_llm = setup_validator_llm(validator_model_name)
         self.neo4j_client = Neo4jClient()
         self.db_schema = self.neo4j_client.get_schema()
         self.run_mode = run_mode
@@ -40,8 +43,8 @@ class EnhancedText2CypherAgent:
         self.enable_embeddings = enable_embeddings
         self.similarity_method = similarity_method
 
-        # Initialize vector database manager
-        self.vector_db_manager = VectorDBManager()
+        # Initialize vector database manager (the app passes its configured one)
+        self.vector_db_manager = vector_db_manager or VectorDBManager()
 
         # Initialize enhanced prompt manager
         self.enhanced_prompt_manager = EnhancedPromptManager(
@@ -57,7 +60,7 @@ class EnhancedText2CypherAgent:
             enable_cache, similarity_method
         )
         self.cypher_validator_node = CypherValidatorNode(
-            self.llm, self.db_schema)
+            self.validator_llm, self.db_schema)
         self.query_executor_node = QueryExecutorNode(self.neo4j_client)
 
         if summarizer_type == "llm":
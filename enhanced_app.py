@@ -14,7 +14,10 @@ app = Flask(__name__)
 agent_lock = threading.Lock()
 
 # Initialize the vector database manager globally
-vector_db_manager = VectorDBManager()
+vector_db_manager = VectorDBManager(
+    use_vector_index=os.environ.get("USE_VECTOR_INDEX", "true").lower() == "true",
+    vector_index_min_candidates=int(os.environ.get("VECTOR_INDEX_MIN_CANDIDATES", "10000")),
+    vector_quantization=os.environ.get("VECTOR_QUANTIZATION", "none"))
 
 # Check for the interaction logging switch from environment variables
 ENABLE_LOGGING = os.environ.get(
@@ -54,7 +57,9 @@ def create_enhanced_agent(run_mode=None, similarity_method=None):
             run_mode=agent_run_mode,
             enable_cache=ENABLE_CACHE,
             enable_embeddings=ENABLE_EMBEDDINGS,
-            similarity_method=agent_similarity_method
+            similarity_method=agent_similarity_method,
+            validator_model_name=os.environ.get("VALIDATOR_MODEL", "gpt-4o-mini"),
+            vector_db_manager=vector_db_manager
         )
         print(f"--- Enhanced Agent Initialized Successfully ---")
         print(f"   Summarizer: {summarizer_choice}")
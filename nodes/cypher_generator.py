@@ -26,14 +26,35 @@ Convert the following natural language query into a Cypher query.
 Natural Language Query: {question}
 """
 
+def _is_user_message(msg) -> bool:
+    """True for a user turn, either a ('user', content) tuple or a LangChain human message."""
+    if isinstance(msg, tuple):
+        return msg[0] in ("user", "human")
+    return getattr(msg, "type", None) == "human" or getattr(msg, "role", None) == "user"
+
+
+def _omitted_history_count(messages: List, max_turns: int) -> int:
+    """
+    Number of leading messages to drop so that only the last max_turns turns remain.
+    A turn starts at a user message and includes every following message up to the next one,
+    so tool results and retried answers never push a user question out of the window.
+    """
+    if max_turns <= 0:
+        return len(messages)
+    turn_starts = [i for i, msg in enumerate(messages) if _is_user_message(msg)]
+    return turn_starts[-max_turns] if len(turn_starts) > max_turns else 0
+
+
 class CypherGeneratorNode:
     """
     A node that generates a Cypher query based on the current state.
     """
 
-    def __init__(self, llm: ChatOpenAI, prompt_manager: PromptManager):
+    def __init__(self, llm: ChatOpenAI, prompt_manager: PromptManager, max_history_turns: int = 6):
         self.llm = llm
         self.prompt_manager = prompt_manager
+        # Only the most recent turns (a user message and the replies that follow it) are sent to the LLM
+        self.max_history_turns = max_history_turns
         self.chain = self.prompt_manager.get_prompt_template() | self.llm
 
     def generate(self, state: GraphState, schema: str) -> dict:
@@ -50,8 +71,11 @@ class CypherGeneratorNode:
         """
         print("--- 1. GENERATING CYPHER QUERY (WITH CONTEXT) ---")
         
-        # The history is all messages EXCEPT the last one
+        # The history is all messages EXCEPT the last one, bounded to the last K turns
+        # so the prompt does not grow with the length of the conversation
         history_messages = state["messages"][:-1]
+        omitted_count = _omitted_history_count(history_messages, self.max_history_turns)
+        history_messages = history_messages[omitted_count:]
         # The current question is the last message
         current_question_message = state["messages"][-1]
 
@@ -67,6 +91,8 @@ class CypherGeneratorNode:
 
         # Format the history for the prompt
         chat_history_str = self.prompt_manager.format_chat_history(history_for_prompt)
+        if omitted_count:
+            chat_history_str = f"({omitted_count} earlier messages omitted)\n" + chat_history_str
 
         # Invoke the chain with all required inputs for the prompt
         response = self.chain.invoke({
@@ -1,3 +1,7 @@
+import difflib
+import re
+from typing import List, Optional, Set, Tuple
+
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 
@@ -20,18 +24,210 @@ Respond with a single word: 'valid' if the query is syntactically correct, or 'i
 {query}
 """
 
+# Parsed once per process and shared by every validator instance
+_VALIDATION_TEMPLATE = ChatPromptTemplate.from_template(VALIDATION_PROMPT_TEMPLATE)
+
+# Keywords that may start a Cypher clause
+CLAUSE_KEYWORDS = {
+    "MATCH", "OPTIONAL", "WITH", "UNWIND", "RETURN", "CALL", "CREATE", "MERGE",
+    "DELETE", "DETACH", "SET", "REMOVE", "FOREACH", "LOAD", "USE", "UNION",
+    "WHERE", "ORDER", "SKIP", "LIMIT", "YIELD", "EXPLAIN", "PROFILE", "SHOW",
+}
+
+CYPHER_KEYWORDS = CLAUSE_KEYWORDS | {
+    "DISTINCT", "AS", "BY", "ASC", "ASCENDING", "DESC", "DESCENDING", "AND",
+    "OR", "XOR", "NOT", "IN", "IS", "NULL", "TRUE", "FALSE", "CASE", "WHEN",
+    "THEN", "ELSE", "END", "CONTAINS", "STARTS", "ENDS", "EXISTS", "COUNT",
+    "ON", "ALL", "ANY", "NONE", "SINGLE", "CSV", "HEADERS", "FROM", "FIELDTERMINATOR",
+}
+
+# Keywords that always need something after them; any other keyword at the end of a
+# query may just be an identifier (e.g. a variable called `count`)
+_DANGLING_KEYWORDS = CLAUSE_KEYWORDS | {
+    "DISTINCT", "AS", "BY", "AND", "OR", "XOR", "NOT", "IN", "IS", "CASE", "WHEN",
+    "THEN", "ELSE", "CONTAINS", "STARTS", "ENDS", "ON", "FROM", "FIELDTERMINATOR",
+}
+_DANGLING_PUNCTUATION = {",", ".", ":", "=", "+", "-", "|", "<", ">"}
+_BRACKET_PAIRS = {")": "(", "]": "[", "}": "{"}
+
+_TOKEN_RE = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<line_comment>//[^\n]*)
+  | (?P<block_comment>/\*.*?\*/)
+  | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<quoted>`[^`]*`)
+  | (?P<param>\$\w+)
+  | (?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<punct>.)
+""", re.VERBOSE | re.DOTALL)
+
+
+def _tokenize(query: str) -> List[Tuple[str, str]]:
+    """
+    Splits a Cypher query into (kind, value) tokens, dropping whitespace and comments.
+    Backticked identifiers keep their own "quoted" kind (without the backticks), so they
+    are never mistaken for keywords.
+
+    Raises:
+        ValueError: If a string literal, quoted identifier or comment is not terminated.
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer(query):
+        kind = match.lastgroup
+        value = match.group()
+        if kind in ("space", "line_comment", "block_comment"):
+            continue
+        if kind == "punct" and value in ("'", '"', "`"):
+            raise ValueError(f"unterminated literal starting with {value}")
+        if kind == "punct" and query.startswith("/*", match.start()):
+            raise ValueError("unterminated block comment")
+        if kind == "quoted":
+            value = value[1:-1]
+        tokens.append((kind, value))
+    return tokens
+
+
+def _is_keyword(kind: str, value: str, keyword: str) -> bool:
+    """True if the token is the bare (not backticked) keyword."""
+    return kind == "word" and value.upper() == keyword
+
+
+def parse_schema_vocabulary(schema: str) -> Tuple[Set[str], Set[str]]:
+    """
+    Extracts node labels and relationship types from a Neo4j schema description.
+
+    Args:
+        schema (str): Schema text as returned by Neo4jClient.get_schema().
+
+    Returns:
+        Tuple[Set[str], Set[str]]: (labels, relationship_types)
+    """
+    labels = set(re.findall(r"\(:`?(\w+)`?\)", schema))
+    rel_types = set(re.findall(r"\[:`?(\w+)`?\]", schema))
+
+    # "Node properties" lines look like "Service {name: STRING, ...}"
+    in_node_section = False
+    for line in schema.splitlines():
+        lowered = line.lower()
+        if lowered.startswith("node properties"):
+            in_node_section = True
+            continue
+        if lowered.startswith("relationship") or lowered.startswith("the relationships"):
+            in_node_section = False
+            continue
+        if in_node_section:
+            match = re.match(r"\s*`?(\w+)`?\s*\{", line)
+            if match:
+                labels.add(match.group(1))
+
+    return labels, rel_types
+
+
+def check_cypher_syntax(query: str, labels: Set[str] = None,
+                        rel_types: Set[str] = None) -> Tuple[Optional[str], str]:
+    """
+    Deterministically checks a Cypher query for the mistakes an LLM validator looks for:
+    unterminated literals, unbalanced brackets, keyword typos, dangling clauses and
+    unknown labels / relationship types.
+
+    Args:
+        query (str): The Cypher query to check.
+        labels (Set[str]): Known node labels; label checks are skipped when empty.
+        rel_types (Set[str]): Known relationship types; type checks are skipped when empty.
+
+    Returns:
+        Tuple[Optional[str], str]: ('valid' | 'invalid' | None, reason). None means the
+        query uses constructs this checker cannot judge with confidence.
+    """
+    try:
+        tokens = _tokenize(query.strip().rstrip(";"))
+    except ValueError as e:
+        return "invalid", str(e)
+
+    if not tokens:
+        return "invalid", "empty query"
+
+    ambiguous_reason = ""
+    # Each stack entry is (bracket, is_relationship_bracket)
+    stack = []
+    for i, (kind, value) in enumerate(tokens):
+        prev_kind, prev_value = tokens[i - 1] if i > 0 else ("", "")
+
+        if kind == "punct" and value in "([{":
+            stack.append((value, value == "[" and prev_value == "-"))
+            continue
+        if kind == "punct" and value in ")]}":
+            if not stack or stack[-1][0] != _BRACKET_PAIRS[value]:
+                return "invalid", f"unbalanced '{value}'"
+            stack.pop()
+            continue
+        if kind not in ("word", "quoted"):
+            continue
+
+        # Labels and relationship types: ':' followed by a name outside of map literals
+        if prev_value in (":", "|") and (not stack or stack[-1][0] != "{"):
+            if prev_value == "|" and not (stack and stack[-1][1]):
+                continue
+            in_relationship = bool(stack and stack[-1][1])
+            known = rel_types if in_relationship else labels
+            if known and value not in known:
+                if difflib.get_close_matches(value, known, n=1, cutoff=0.8):
+                    kind_name = "relationship type" if in_relationship else "label"
+                    return "invalid", f"unknown {kind_name} '{value}'"
+                ambiguous_reason = f"'{value}' is not in the schema"
+            continue
+
+        # Keyword typos such as MACTH / RETRUN, only for bare upper-case words
+        upper = value.upper()
+        if (kind == "word" and not stack and value.isupper() and len(value) >= 4
+                and upper not in CYPHER_KEYWORDS
+                and prev_value not in (".", ":", "$")
+                and not _is_keyword(prev_kind, prev_value, "AS")):
+            next_value = tokens[i + 1][1] if i + 1 < len(tokens) else ""
+            if next_value != "(" and difflib.get_close_matches(
+                    upper, CLAUSE_KEYWORDS, n=1, cutoff=0.75):
+                return "invalid", f"possible keyword typo '{value}'"
+
+    if stack:
+        return "invalid", f"unclosed '{stack[-1][0]}'"
+
+    first_kind, first_value = tokens[0]
+    if first_kind != "word" or first_value.upper() not in CLAUSE_KEYWORDS:
+        if first_kind == "word" and difflib.get_close_matches(
+                first_value.upper(), CLAUSE_KEYWORDS, n=1, cutoff=0.75):
+            return "invalid", f"possible keyword typo '{first_value}'"
+        return None, f"query starts with '{first_value}'"
+
+    last_kind, last_value = tokens[-1]
+    if last_kind == "word" and last_value.upper() in _DANGLING_KEYWORDS:
+        prev_kind, prev_value = tokens[-2] if len(tokens) > 1 else ("", "")
+        # After AS or '.' the word is an alias / property name, not a keyword
+        if not (prev_value == "." or _is_keyword(prev_kind, prev_value, "AS")):
+            # After ',' or another keyword it may be a variable named like a keyword
+            if prev_value == "," or (prev_kind == "word" and prev_value.upper() in CYPHER_KEYWORDS):
+                return None, f"query ends with '{last_value}'"
+            return "invalid", f"query ends with keyword '{last_value}'"
+    if last_kind == "punct" and last_value in _DANGLING_PUNCTUATION:
+        return "invalid", f"query ends with '{last_value}'"
+
+    if ambiguous_reason:
+        return None, ambiguous_reason
+    return "valid", "ok"
+
 
 class CypherValidatorNode:
     """
-    A node that validates the syntax of a generated Cypher query using an LLM.
+    A node that validates the syntax of a generated Cypher query.
+    A local parser decides most queries; the LLM is only consulted when the parser is unsure.
     """
 
-    def __init__(self, llm: ChatOpenAI, schema: str):
+    def __init__(self, llm: Optional[ChatOpenAI], schema: str):
         self.llm = llm
         self.schema = schema
-        self.prompt_template = ChatPromptTemplate.from_template(
-            VALIDATION_PROMPT_TEMPLATE)
-        self.chain = self.prompt_template | self.llm
+        self.labels, self.rel_types = parse_schema_vocabulary(schema)
+        self.prompt_template = _VALIDATION_TEMPLATE
+        self.chain = self.prompt_template | self.llm if llm is not None else None
 
     def validate(self, state: GraphState) -> dict:
         """
@@ -46,6 +242,16 @@ class CypherValidatorNode:
         print("--- 4. VALIDATING CYPHER SYNTAX ---")
         query_to_validate = state["generation"]
 
+        validation_result, reason = check_cypher_syntax(
+            query_to_validate, self.labels, self.rel_types)
+        print(f"   - Parser Result: {validation_result or 'undecided'} ({reason})")
+
+        if validation_result is not None:
+            return {"validation_result": validation_result}
+        if self.chain is None:
+            # Nothing else to consult; let execution be the final judge
+            return {"validation_result": "valid"}
+
         response = self.chain.invoke({
             "schema": self.schema,
             "query": query_to_validate
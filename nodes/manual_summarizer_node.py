@@ -1,8 +1,19 @@
-import json
-from langchain_core.messages import ToolMessage
+import orjson
 from agent_state import GraphState
 
 
+def _is_table(rows) -> bool:
+    """
+    Checks whether the result is a non-empty list whose rows are all dicts (or dict subclasses).
+    An empty list is not a table (it is reported as "No results found."), and a list mixing dicts
+    with other values is shown as key/value data. The row types are collected with map()/set(),
+    so only the few distinct types, not every row, go through the Python-level subclass check.
+    """
+    if not isinstance(rows, list) or not rows:
+        return False
+    return all(issubclass(row_type, dict) for row_type in set(map(type, rows)))
+
+
 class ManualSummarizerNode:
     """
     A node that processes query results with predefined logic,
@@ -21,25 +32,18 @@ class ManualSummarizerNode:
         """
         print("--- 6. SUMMARIZING RESULT (MANUAL LOGIC) ---")
 
-        query_result_str = ""
-        for msg in reversed(state["messages"]):
-            if isinstance(msg, ToolMessage):
-                query_result_str = msg.content
-                break
-
-        try:
-            query_result = json.loads(query_result_str)
-        except json.JSONDecodeError:
+        # The executor leaves the result object in state, so no JSON round-trip is needed
+        query_result = state.get("raw_result")
+        if query_result is None:
             structured_summary = {
                 "type": "error",
                 "content": "Failed to parse query result."
             }
-            print(
-                f"   - Structured Summary: {json.dumps(structured_summary, indent=2)}")
-            return {"summary": json.dumps(structured_summary)}
+            print(f"   - Structured Summary: {structured_summary['type']}")
+            return {"summary": orjson.dumps(structured_summary).decode()}
 
         # Apply simple logic: check if the result is a list of objects (table)
-        if isinstance(query_result, list) and query_result and all(isinstance(i, dict) for i in query_result):
+        if _is_table(query_result):
             structured_summary = {
                 "type": "table",
                 "headers": list(query_result[0].keys()),
@@ -58,7 +62,9 @@ class ManualSummarizerNode:
                 "data": query_result
             }
 
-        print(
-            f"   - Structured Summary: {json.dumps(structured_summary, indent=2)}")
+        print(f"   - Structured Summary: {structured_summary['type']}")
 
-        return {"summary": json.dumps(structured_summary)}
+        # Serialize once, only for the response that is shipped to the frontend.
+        # orjson encodes straight to UTF-8 bytes; the single decode is needed because
+        # the summary is also stored in the (text) conversation history.
+        return {"summary": orjson.dumps(structured_summary, default=str).decode()}
@@ -1,9 +1,12 @@
-import json
+import orjson
 from langchain_core.messages import ToolMessage
 
 from agent_state import GraphState
 from tools.neo4j_client import Neo4jClient
 
+# Number of rows echoed into the ToolMessage; the full result travels in state["raw_result"]
+PREVIEW_ROWS = 5
+
 
 class QueryExecutorNode:
     """
@@ -21,18 +24,28 @@ class QueryExecutorNode:
             state (GraphState): The current state of the graph.
 
         Returns:
-            dict: A dictionary containing a ToolMessage with the query result or error.
+            dict: A dictionary containing a ToolMessage with a preview of the result or
+                  the error, and the full result object under "raw_result".
         """
         print("--- 2. EXECUTING CYPHER QUERY ---")
         query = state["generation"]
 
         try:
             query_result = self.neo4j_client.query(query)
-            print(f"   - Query Result: {query_result}")
-            # Return the result as a ToolMessage
-            return {"messages": [ToolMessage(content=json.dumps(query_result), tool_call_id="executor")]}
+            row_count = len(query_result) if isinstance(query_result, list) else 1
+            print(f"   - Query Result: {row_count} row(s)")
+            # Only a small preview is serialized; summarizers read the object from state
+            preview = query_result[:PREVIEW_ROWS] if isinstance(query_result, list) else query_result
+            content = f"Query returned {row_count} row(s). Preview: {orjson.dumps(preview, default=str).decode()}"
+            return {
+                "messages": [ToolMessage(content=content, tool_call_id="executor")],
+                "raw_result": query_result
+            }
         except Exception as e:
             print(f"   - Execution Failed: {e}")
             # If the query fails, return the error message as a ToolMessage
             error_message = f"Query execution failed with error: {str(e)}"
-            return {"messages": [ToolMessage(content=error_message, tool_call_id="executor")]}
+            return {
+                "messages": [ToolMessage(content=error_message, tool_call_id="executor")],
+                "raw_result": None
+            }
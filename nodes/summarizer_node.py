@@ -1,6 +1,6 @@
+import orjson
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.messages import ToolMessage
 
 from agent_state import GraphState
 
@@ -20,6 +20,9 @@ Do not just restate the data; interpret it and present it in a helpful way. If t
 # Your Summary:
 """
 
+# Parsed once per process and shared by every summarizer instance
+_SUMMARIZER_TEMPLATE = ChatPromptTemplate.from_template(SUMMARIZER_PROMPT_TEMPLATE)
+
 
 class SummarizerNode:
     """
@@ -28,8 +31,7 @@ class SummarizerNode:
 
     def __init__(self, llm: ChatOpenAI):
         self.llm = llm
-        self.prompt_template = ChatPromptTemplate.from_template(
-            SUMMARIZER_PROMPT_TEMPLATE)
+        self.prompt_template = _SUMMARIZER_TEMPLATE
         self.chain = self.prompt_template | self.llm
 
     def summarize(self, state: GraphState) -> dict:
@@ -46,12 +48,8 @@ class SummarizerNode:
 
         # The original question is the first user message
         original_question = state["messages"][0].content
-        # The query result is in the last ToolMessage
-        query_result = ""
-        for msg in reversed(state["messages"]):
-            if isinstance(msg, ToolMessage):
-                query_result = msg.content
-                break
+        # The executor leaves the full result object in state; serialize it only for the prompt
+        query_result = orjson.dumps(state.get("raw_result"), default=str).decode()
 
         response = self.chain.invoke({
             "question": original_question,
@@ -1,6 +1,10 @@
-import json
+import os
 from typing import List, Dict, Optional
+
+import orjson
+
 from database.vector_db_manager import VectorDBManager
+from prompts.prompt_manager import _load_examples_cached
 
 
 class EnhancedPromptManager:
@@ -16,6 +20,11 @@ class EnhancedPromptManager:
         self.base_prompt_template = base_prompt_template or self._get_default_prompt()
         self.examples_file_path = examples_file_path
         self.default_similarity_method = default_similarity_method
+        # Parsed examples file, reloaded only when its mtime changes
+        self._static_cache = None
+        self._static_mtime = 0
+        # (mtime, count) -> formatted static examples text
+        self._static_text_cache = {}
 
     def _get_default_prompt(self) -> str:
         """Get the default prompt template."""
@@ -34,8 +43,13 @@ class EnhancedPromptManager:
 
 请生成一个Cypher查询语句，只返回查询语句，不要包含任何解释或额外文本。"""
 
+    def _embed_question(self, question: str) -> List[float]:
+        """Embed the question once so every lookup for the same prompt can reuse the vector."""
+        return self.vector_db_manager.embedding_client.get_embedding(question, use_cache=True)
+
     def get_dynamic_examples(self, question: str, max_examples: int = 5,
-                           similarity_method: str = None) -> List[Dict]:
+                           similarity_method: str = None,
+                           query_vector: Optional[List[float]] = None) -> List[Dict]:
         """
         Get dynamically selected examples based on semantic similarity.
 
@@ -43,19 +57,34 @@ class EnhancedPromptManager:
             question (str): The user's question
             max_examples (int): Maximum number of examples to return
             similarity_method (str): Similarity method to use
+            query_vector (List[float]): Precomputed embedding of the question
 
         Returns:
             List[Dict]: List of similar examples
         """
         if similarity_method is None:
             similarity_method = self.default_similarity_method
+
+        # Cold start: nothing stored yet, go straight to the static examples
+        if self.vector_db_manager.count('example') == 0:
+            return self._complete_examples([], max_examples)
             
         # Find similar examples using semantic search
-        similar_examples = self.vector_db_manager.find_similar_examples(
-            question, top_k=max_examples, min_similarity=0.7,
-            method=similarity_method
-        )
+        if query_vector is not None:
+            similar_examples = self.vector_db_manager.find_similar_examples_by_vector(
+                query_vector, top_k=max_examples, min_similarity=0.7,
+                method=similarity_method
+            )
+        else:
+            similar_examples = self.vector_db_manager.find_similar_examples(
+                question, top_k=max_examples, min_similarity=0.7,
+                method=similarity_method
+            )
 
+        return self._complete_examples(similar_examples, max_examples)
+
+    def _complete_examples(self, similar_examples: List[Dict], max_examples: int) -> List[Dict]:
+        """Convert vector DB matches to prompt examples, topping up with static examples."""
         # Convert to the expected format
         examples = []
         for example in similar_examples:
@@ -80,7 +109,8 @@ class EnhancedPromptManager:
         return examples
 
     def get_similar_feedback(self, question: str, max_feedback: int = 3,
-                           similarity_method: str = None) -> List[Dict]:
+                           similarity_method: str = None,
+                           query_vector: Optional[List[float]] = None) -> List[Dict]:
         """
         Get similar feedback based on semantic similarity.
 
@@ -88,34 +118,97 @@ class EnhancedPromptManager:
             question (str): The user's question
             max_feedback (int): Maximum number of feedback items to return
             similarity_method (str): Similarity method to use
+            query_vector (List[float]): Precomputed embedding of the question
 
         Returns:
             List[Dict]: List of similar feedback
         """
         if similarity_method is None:
             similarity_method = self.default_similarity_method
+
+        if self.vector_db_manager.count('feedback') == 0:
+            return []
             
-        similar_feedback = self.vector_db_manager.find_similar_feedback(
-            question, top_k=max_feedback, min_similarity=0.8,
-            method=similarity_method
-        )
+        if query_vector is not None:
+            similar_feedback = self.vector_db_manager.find_similar_feedback_by_vector(
+                query_vector, top_k=max_feedback, min_similarity=0.8,
+                method=similarity_method
+            )
+        else:
+            similar_feedback = self.vector_db_manager.find_similar_feedback(
+                question, top_k=max_feedback, min_similarity=0.8,
+                method=similarity_method
+            )
 
         return similar_feedback
 
+    def _search_examples_and_feedback(self, query_vector: List[float], similarity_method: str,
+                                      max_examples: int = 5, max_feedback: int = 3):
+        """
+        Fetch similar examples and feedback with a single multi-collection search.
+
+        Returns:
+            Tuple[List[Dict], List[Dict]]: (examples, feedback) in the formats of
+            get_dynamic_examples and get_similar_feedback
+        """
+        matches = self.vector_db_manager.find_similar_multi(
+            query_vector,
+            collections=[('example', 0.7, max_examples), ('feedback', 0.8, max_feedback)],
+            method=similarity_method
+        )
+        return self._complete_examples(matches['example'], max_examples), matches['feedback']
+
     def _load_static_examples(self) -> List[Dict]:
-        """Load static examples from the examples file."""
+        """
+        Load static examples from the examples file.
+        The parsed list is cached and only re-read when the file's mtime changes;
+        callers must treat it as read-only.
+        """
+        try:
+            mtime = os.stat(self.examples_file_path).st_mtime
+        except FileNotFoundError:
+            print(
+                f"Warning: Examples file {self.examples_file_path} not found")
+            self._static_cache = None
+            self._static_text_cache.clear()
+            return []
+
+        if self._static_cache is not None and mtime == self._static_mtime:
+            return self._static_cache
+
         try:
-            with open(self.examples_file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            # Same parse cache as PromptManager, so the file is decoded once per process
+            examples = list(_load_examples_cached(self.examples_file_path, mtime))
         except FileNotFoundError:
             print(
                 f"Warning: Examples file {self.examples_file_path} not found")
             return []
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             print(
                 f"Warning: Invalid JSON in examples file {self.examples_file_path}")
             return []
 
+        self._static_cache = examples
+        self._static_mtime = mtime
+        self._static_text_cache.clear()
+        return examples
+
+    def _format_static_examples(self, count: int = 5) -> str:
+        """Format the first `count` static examples; the text is identical across requests, so it is memoized."""
+        static_examples = self._load_static_examples()
+        if not static_examples:
+            return self.format_examples_for_prompt([])
+
+        key = (self._static_mtime, count)
+        text = self._static_text_cache.get(key)
+        if text is None:
+            examples = [{'natural_language': ex['natural_language'],
+                         'cypher': ex['cypher'], 'similarity': 0.0}
+                        for ex in static_examples[:count]]
+            text = self.format_examples_for_prompt(examples)
+            self._static_text_cache[key] = text
+        return text
+
     def format_examples_for_prompt(self, examples: List[Dict]) -> str:
         """
         Format examples for inclusion in the prompt.
@@ -160,33 +253,44 @@ class EnhancedPromptManager:
         """
         if similarity_method is None:
             similarity_method = self.default_similarity_method
-            
-        # Get examples
-        if use_dynamic_examples:
-            examples = self.get_dynamic_examples(question, similarity_method=similarity_method)
-        else:
-            static_examples = self._load_static_examples()
-            examples = [{'natural_language': ex['natural_language'],
-                        'cypher': ex['cypher'], 'similarity': 0.0}
-                        for ex in static_examples[:5]]
 
-        # Get similar feedback if requested
-        feedback_examples = []
-        if include_feedback:
-            feedback_examples = self.get_similar_feedback(question, similarity_method=similarity_method)
+        # Empty collections need no search, and with nothing to search the question is not embedded
+        search_examples = use_dynamic_examples and self.vector_db_manager.count('example') > 0
+        search_feedback = include_feedback and self.vector_db_manager.count('feedback') > 0
+
+        # Embed the question once and share the vector between both lookups
+        query_vector = None
+        if search_examples or search_feedback:
+            query_vector = self._embed_question(question)
 
-        # Format examples
-        examples_text = self.format_examples_for_prompt(examples)
+        if search_examples and search_feedback:
+            # Both collections in one vector DB round trip
+            examples, feedback_examples = self._search_examples_and_feedback(
+                query_vector, similarity_method)
+            examples_text = self.format_examples_for_prompt(examples)
+        else:
+            # Get examples
+            if use_dynamic_examples:
+                examples = self.get_dynamic_examples(question, similarity_method=similarity_method,
+                                                     query_vector=query_vector)
+                examples_text = self.format_examples_for_prompt(examples)
+            else:
+                examples_text = self._format_static_examples(5)
+
+            # Get similar feedback if requested
+            feedback_examples = []
+            if include_feedback:
+                feedback_examples = self.get_similar_feedback(question, similarity_method=similarity_method,
+                                                              query_vector=query_vector)
 
         # Add feedback examples if available
         if feedback_examples:
-            feedback_text = "\n\n用户反馈示例:\n"
-            for i, feedback in enumerate(feedback_examples, 1):
-                feedback_text += (
-                    f"反馈{i} (相似度: {feedback['similarity']:.2f}):\n"
-                    f"问题: {feedback['text_content']}\n"
-                    f"正确Cypher: {feedback['cypher_query']}\n\n"
-                )
+            feedback_text = "\n\n用户反馈示例:\n" + "".join([
+                f"反馈{i} (相似度: {feedback['similarity']:.2f}):\n"
+                f"问题: {feedback['text_content']}\n"
+                f"正确Cypher: {feedback['cypher_query']}\n\n"
+                for i, feedback in enumerate(feedback_examples, 1)
+            ])
             examples_text += feedback_text
 
         # Create the prompt
@@ -212,17 +316,24 @@ class EnhancedPromptManager:
         if similarity_method is None:
             similarity_method = self.default_similarity_method
             
-        examples = self.get_dynamic_examples(question, similarity_method=similarity_method)
-        feedback = self.get_similar_feedback(question, similarity_method=similarity_method)
+        if self.vector_db_manager.count() == 0:
+            examples, feedback = self._complete_examples([], 5), []
+        else:
+            query_vector = self._embed_question(question)
+            examples, feedback = self._search_examples_and_feedback(query_vector, similarity_method)
+
+        # One pass per list; the averages reuse the extracted scores
+        example_similarities = [ex.get('similarity', 0) for ex in examples]
+        feedback_similarities = [fb.get('similarity', 0) for fb in feedback]
 
         return {
             'examples_used': len(examples),
             'feedback_used': len(feedback),
             'similarity_method': similarity_method,
-            'example_similarities': [ex.get('similarity', 0) for ex in examples],
-            'feedback_similarities': [fb.get('similarity', 0) for fb in feedback],
-            'avg_example_similarity': sum(ex.get('similarity', 0) for ex in examples) / len(examples) if examples else 0,
-            'avg_feedback_similarity': sum(fb.get('similarity', 0) for fb in feedback) / len(feedback) if feedback else 0
+            'example_similarities': example_similarities,
+            'feedback_similarities': feedback_similarities,
+            'avg_example_similarity': sum(example_similarities) / len(example_similarities) if example_similarities else 0,
+            'avg_feedback_similarity': sum(feedback_similarities) / len(feedback_similarities) if feedback_similarities else 0
         }
 
     def set_similarity_method(self, method: str):
@@ -1,7 +1,10 @@
-import json
+import functools
+import os
+from pathlib import Path
 from typing import List, Tuple, Dict
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import AIMessage, HumanMessage
+import orjson
 
 DEFAULT_PROMPT_TEMPLATE = """
 # Instructions:
@@ -31,6 +34,53 @@ Based on the conversation history and the user's question below, generate the ap
 Natural Language Query: {question}
 """
 
+
+@functools.lru_cache(maxsize=None)
+def _compile_prompt_template(template_str: str) -> ChatPromptTemplate:
+    """Parses a prompt template string once per process; templates are immutable and safe to share."""
+    return ChatPromptTemplate.from_template(template_str)
+
+
+# The default template is compiled at import time, so the common path never parses it per instance
+_DEFAULT_TEMPLATE = _compile_prompt_template(DEFAULT_PROMPT_TEMPLATE)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_examples_cached(file_path: str, mtime: float) -> Tuple[Dict, ...]:
+    """Parses an examples file once per (path, mtime); the tuple is shared, so the dicts must not be mutated."""
+    return tuple(orjson.loads(Path(file_path).read_bytes()))
+
+
+@functools.lru_cache(maxsize=8)
+def _format_example_pairs(pairs: Tuple[Tuple[str, str], ...]) -> str:
+    """Renders (natural_language, cypher) pairs once per distinct example set."""
+    return "\n\n".join([f"# Natural Language: {nl}\n# Cypher: {cypher}" for nl, cypher in pairs])
+
+
+# Summaries longer than this are parsed on every call instead of being memoized, so the cache
+# never pins large result payloads in memory
+_SUMMARY_CACHE_MAX_CHARS = 4096
+
+
+def _render_summary(content: str) -> str:
+    """Renders a manual (JSON) summary as a history line."""
+    try:
+        summary_data = orjson.loads(content)
+        return f"Agent: (Responded with structured data of type: {summary_data.get('type')})\n"
+    except (orjson.JSONDecodeError, AttributeError):
+        return "Agent: (Responded with structured data)\n"
+
+
+_render_summary_cached = functools.lru_cache(maxsize=64)(_render_summary)
+
+
+def _parse_summary(content: str) -> str:
+    """Renders a manual summary; short ones are memoized because every prompt build replays the history."""
+    if len(content) > _SUMMARY_CACHE_MAX_CHARS:
+        return _render_summary(content)
+    return _render_summary_cached(content)
+
+
 class PromptManager:
     """
     Manages loading and formatting of prompt templates, few-shot examples, and user feedback.
@@ -45,14 +95,16 @@ class PromptManager:
         # Use feedback examples passed in from the agent orchestrator
         self.formatted_feedback_examples = self._format_examples_for_prompt(feedback_examples)
 
-        self.prompt_template = ChatPromptTemplate.from_template(self.template_str)
+        if prompt_template_str is None:
+            self.prompt_template = _DEFAULT_TEMPLATE
+        else:
+            self.prompt_template = _compile_prompt_template(self.template_str)
 
     def _load_examples_from_json(self, file_path: str) -> List[Dict]:
-        """Loads few-shot examples from a standard JSON file."""
+        """Loads few-shot examples from a standard JSON file, reusing the parsed file while it is unchanged."""
         try:
-            with open(file_path, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError) as e:
+            return list(_load_examples_cached(file_path, os.stat(file_path).st_mtime))
+        except (FileNotFoundError, orjson.JSONDecodeError) as e:
             print(f"Warning: Could not load examples from {file_path}. Error: {e}")
             return []
     
@@ -61,9 +113,10 @@ class PromptManager:
         if not examples:
             return "No examples available."
         
-        return "\n\n".join(
-            [f"# Natural Language: {ex['natural_language']}\n# Cypher: {ex['cypher']}" for ex in examples if ex.get('natural_language') and ex.get('cypher')]
-        )
+        # The rendered text is memoized per example set, so repeated instantiation only builds the key
+        return _format_example_pairs(tuple(
+            (ex['natural_language'], ex['cypher']) for ex in examples if ex.get('natural_language') and ex.get('cypher')
+        ))
     
     @staticmethod
     def format_chat_history(messages: List[Tuple[str, str]]) -> str:
@@ -71,22 +124,19 @@ class PromptManager:
         if not messages:
             return "No previous conversation."
         
-        history_str = ""
+        # Collect the lines and join once; repeated += copies the growing string
+        history_parts = []
         for role, content in messages:
             # We only care about user questions and agent's summaries for history
             if role == "user":
-                history_str += f"User: {content}\n"
+                history_parts.append(f"User: {content}\n")
             elif isinstance(content, str) and content.startswith('{"type":'): # Heuristic for manual summary
-                 # Try to parse the manual summary for a more readable history
-                try:
-                    summary_data = json.loads(content)
-                    history_str += f"Agent: (Responded with structured data of type: {summary_data.get('type')})\n"
-                except:
-                     history_str += f"Agent: (Responded with structured data)\n"
+                 # Parse the manual summary for a more readable history (cached per summary string)
+                history_parts.append(_parse_summary(content))
             elif isinstance(content, str): # Assumes LLM summary
-                 history_str += f"Agent: {content}\n"
+                 history_parts.append(f"Agent: {content}\n")
         
-        return history_str
+        return "".join(history_parts)
 
 
     def get_prompt_template(self) -> ChatPromptTemplate:
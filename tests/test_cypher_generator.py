@@ -0,0 +1,32 @@
+import unittest
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from nodes.cypher_generator import _omitted_history_count
+
+
+class OmittedHistoryCountTest(unittest.TestCase):
+
+    def test_counts_user_turns_not_messages(self):
+        messages = [
+            HumanMessage(content="q1"), AIMessage(content="a1"),
+            HumanMessage(content="q2"), AIMessage(content="bad"), ToolMessage(content="error", tool_call_id="1"),
+            AIMessage(content="retry"), AIMessage(content="a2"),
+            HumanMessage(content="q3"), AIMessage(content="a3"),
+        ]
+        self.assertEqual(_omitted_history_count(messages, 2), 2)
+        self.assertEqual(_omitted_history_count(messages, 1), 7)
+        self.assertEqual(_omitted_history_count(messages, 3), 0)
+        self.assertEqual(_omitted_history_count(messages, 10), 0)
+
+    def test_tuple_messages(self):
+        messages = [("user", "q1"), ("assistant", "a1"), ("user", "q2"), ("assistant", "a2")]
+        self.assertEqual(_omitted_history_count(messages, 1), 2)
+
+    def test_zero_turns_drops_everything(self):
+        self.assertEqual(_omitted_history_count([("user", "q1"), ("assistant", "a1")], 0), 2)
+        self.assertEqual(_omitted_history_count([], 3), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+from nodes.cypher_validator import CypherValidatorNode, check_cypher_syntax
+
+LABELS = {"Service", "Instance", "Region"}
+REL_TYPES = {"DEPENDS_ON", "INSTANCE_OF", "LOCATED_IN"}
+
+
+def verdict(query):
+    return check_cypher_syntax(query, LABELS, REL_TYPES)[0]
+
+
+class CheckCypherSyntaxTest(unittest.TestCase):
+
+    def test_valid_queries(self):
+        for query in [
+            "MATCH (s:Service) RETURN s.name",
+            "MATCH (s:Service)-[:DEPENDS_ON]->(d:Service) RETURN d.name ORDER BY d.name DESC",
+            "MATCH (i:Instance)-[:INSTANCE_OF]->(s:Service {name: 'user-service'}) RETURN i.id AS instance_id",
+            "MATCH (s:`Service`) RETURN s",
+        ]:
+            with self.subTest(query=query):
+                self.assertEqual(verdict(query), "valid")
+
+    def test_alias_named_like_a_keyword_is_valid(self):
+        for query in [
+            "MATCH (n:Service) RETURN count(n) AS count",
+            "MATCH (x:Service) RETURN x AS `all`",
+            "MATCH (x:Service) RETURN x AS `RETURN`",
+            "MATCH (n:Service) RETURN n.count",
+            "MATCH (n:Service) WITH count(n) AS count RETURN count",
+        ]:
+            with self.subTest(query=query):
+                self.assertEqual(verdict(query), "valid")
+
+    def test_invalid_queries(self):
+        for query in [
+            "MATCH (s:Service RETURN s",
+            "MATCH (s:Service) RETURN s.name]",
+            "MATCH (s:Service) WHERE s.name = 'x RETURN s",
+            "MACTH (s:Service) RETURN s",
+            "MATCH (s:Service) RETRUN s",
+            "MATCH (s:Service) RETURN s LIMIT",
+            "MATCH (s:Service) WHERE s.name = 'x' AND",
+            "MATCH (s:Service) RETURN s,",
+            "MATCH (s:Servise) RETURN s",
+            "MATCH (s:Service)-[:DEPENDS_ONN]->(d) RETURN d",
+            "RETURN `unterminated",
+            "",
+        ]:
+            with self.subTest(query=query):
+                self.assertEqual(verdict(query), "invalid")
+
+    def test_undecided_queries_fall_back(self):
+        for query in [
+            "FOO (s:Service) RETURN s",
+            "MATCH (s:Pod) RETURN s",
+            "MATCH (s:Service) RETURN s ORDER BY",
+        ]:
+            with self.subTest(query=query):
+                self.assertIsNone(verdict(query))
+
+
+class CypherValidatorNodeTest(unittest.TestCase):
+
+    def test_alias_query_is_not_sent_back_for_regeneration(self):
+        node = CypherValidatorNode(None, "")
+        state = {"generation": "MATCH (n) RETURN count(n) AS count"}
+        self.assertEqual(node.validate(state), {"validation_result": "valid"})
+
+
+if __name__ == "__main__":
+    unittest.main()
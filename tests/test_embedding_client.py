@@ -0,0 +1,252 @@
+import os
+import threading
+import unittest
+from unittest import mock
+
+import faiss
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from tools.embedding_client import EmbeddingClient  # noqa: E402
+
+
+def unit_vectors(count, dimension, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class SimilarityAgreementTest(unittest.TestCase):
+    """batch_semantic_search must score exactly like calculate_similarity."""
+
+    METHODS = ("cosine", "euclidean", "manhattan", "pearson", "jaccard", "hamming")
+
+    def setUp(self):
+        self.client = EmbeddingClient()
+        # 130 components: the packed sign bits span several words with a partial last word
+        vectors = unit_vectors(43, 130)
+        self.queries = ["q0", "q1", "q2"]
+        self.candidates = [f"c{i}" for i in range(40)]
+        self.embeddings = dict(zip(self.queries + self.candidates, vectors))
+        self.client.get_embeddings_batch = lambda texts, use_cache=True: np.array(
+            [self.embeddings[text] for text in texts], dtype=np.float32)
+
+    def test_batch_scores_match_scalar_scores(self):
+        for method in self.METHODS:
+            with self.subTest(method=method):
+                results = self.client.batch_semantic_search(
+                    self.queries, self.candidates, top_k=len(self.candidates), method=method)
+                self.assertEqual(len(results), len(self.queries))
+                for query, row in zip(self.queries, results):
+                    self.assertEqual(len(row), len(self.candidates))
+                    for index, score, text in row:
+                        self.assertEqual(text, self.candidates[index])
+                        expected = self.client.calculate_similarity(
+                            self.embeddings[query], self.embeddings[text], method)
+                        self.assertAlmostEqual(score, expected, places=5)
+
+    def test_binary_similarity_uses_positive_component_signs(self):
+        x = np.array([0.5, -0.1, 0.0, 0.2, 0.3], dtype=np.float32)
+        y = np.array([0.4, 0.2, -0.3, -0.1, 0.6], dtype=np.float32)
+        # positive masks: x -> {0, 3, 4}, y -> {0, 1, 4}
+        self.assertAlmostEqual(self.client.calculate_similarity(x, y, "jaccard"), 2 / 4)
+        self.assertAlmostEqual(self.client.calculate_similarity(x, y, "hamming"), 1 - 2 / 5)
+
+    def test_cosine_normalizes_non_unit_vectors_when_assuming_unit_length(self):
+        client = EmbeddingClient(assume_normalized=True)
+        self.assertAlmostEqual(client.calculate_similarity([2.0, 0.0], [2.0, 0.1]), 2 / np.hypot(2, 0.1), places=6)
+        self.assertAlmostEqual(client.calculate_similarity([2.0, 0.0], [4.0, 0.0], "dot_product"), 1.0, places=6)
+        self.assertEqual(client.calculate_similarity([0.0, 0.0], [1.0, 0.0]), 0.0)
+
+    def test_non_positive_top_k_returns_empty_rows(self):
+        self.assertEqual(self.client.batch_semantic_search(self.queries, self.candidates, top_k=0),
+                         [[], [], []])
+
+
+class CandidateReuseTest(unittest.TestCase):
+    """Stacked candidates and FAISS indices are only reused under an explicit cache_key."""
+
+    def setUp(self):
+        self.client = EmbeddingClient()
+        self.candidates = [list(v) for v in unit_vectors(150, 16, seed=1)]
+        self.query = np.array(self.candidates[7], dtype=np.float32)
+
+    def test_in_place_mutation_is_seen_without_a_key(self):
+        for use_faiss in (False, True):
+            with self.subTest(use_faiss=use_faiss):
+                candidates = list(self.candidates)
+                self.assertEqual(self.client.find_most_similar(self.query, candidates, 1, use_faiss=use_faiss)[0][0], 7)
+                candidates[7] = list(-self.query)
+                candidates[42] = list(self.query)
+                self.assertEqual(self.client.find_most_similar(self.query, candidates, 1, use_faiss=use_faiss)[0][0], 42)
+
+    def test_cache_key_controls_reuse(self):
+        for use_faiss in (False, True):
+            with self.subTest(use_faiss=use_faiss):
+                candidates = list(self.candidates)
+                key = ("examples", use_faiss, 1)
+                search = lambda k: self.client.find_most_similar(
+                    self.query, candidates, 1, use_faiss=use_faiss, cache_key=k)[0][0]
+                self.assertEqual(search(key), 7)
+                candidates[7] = list(-self.query)
+                candidates[42] = list(self.query)
+                # same key: the stacked matrix / index from the first call is reused
+                self.assertEqual(search(key), 7)
+                # new version: rebuilt from the mutated list
+                self.assertEqual(search(("examples", use_faiss, 2)), 42)
+
+
+class CandidateIndexTest(unittest.TestCase):
+    """Named FAISS indices score like the exhaustive sklearn path."""
+
+    def setUp(self):
+        self.client = EmbeddingClient()
+        self.candidates = unit_vectors(200, 16, seed=2)
+        self.query = unit_vectors(1, 16, seed=3)[0]
+
+    def assert_same_ranking(self, found, expected):
+        self.assertEqual([i for i, _ in found], [i for i, _ in expected])
+        for (_, a), (_, b) in zip(found, expected):
+            self.assertAlmostEqual(a, b, places=5)
+
+    def test_named_index_matches_exhaustive_search(self):
+        for method in ("cosine", "euclidean"):
+            with self.subTest(method=method):
+                self.client.build_candidate_index(method, self.candidates[:150], method=method)
+                self.client.add_to_candidate_index(method, [self.candidates[150:180], self.candidates[180:]])
+                expected = self.client.find_most_similar_sklearn(self.query, self.candidates, 5, method)
+                self.assert_same_ranking(self.client.search_candidate_index(method, self.query, 5), expected)
+
+    def test_concurrent_appends_keep_every_candidate(self):
+        self.client.build_candidate_index("shared", self.candidates[:8])
+        chunks = [self.candidates[i:i + 8] for i in range(8, 200, 8)]
+        threads = [threading.Thread(target=self.client.add_to_candidate_index, args=("shared", [chunk]))
+                   for chunk in chunks]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        _, index, valid_indices, count = self.client._named_faiss_indices["shared"]
+        self.assertEqual((index.ntotal, count), (200, 200))
+        self.assertEqual(sorted(valid_indices.tolist()), list(range(200)))
+
+    def test_faiss_path_skips_empty_candidates(self):
+        candidates = [list(v) for v in self.candidates]
+        candidates[0] = []
+        expected = self.client.find_most_similar_sklearn(self.query, candidates, 5)
+        self.assert_same_ranking(self.client.find_most_similar_faiss(self.query, candidates, 5), expected)
+        self.assertEqual(self.client.find_most_similar_faiss(self.query, candidates, 0), [])
+
+    def test_large_named_index_uses_shared_hnsw_parameters(self):
+        candidates = unit_vectors(EmbeddingClient.FAISS_HNSW_MIN_CANDIDATES + 200, 16, seed=4)
+        for method in ("cosine", "euclidean"):
+            with self.subTest(method=method):
+                self.client.build_candidate_index("large", candidates, method=method)
+                index = self.client._named_faiss_indices["large"][1]
+                self.assertEqual(index.hnsw.efConstruction, EmbeddingClient.FAISS_HNSW_EF_CONSTRUCTION)
+                self.assertEqual(index.hnsw.efSearch, EmbeddingClient.FAISS_HNSW_EF_SEARCH)
+                top = self.client.search_candidate_index("large", candidates[321], 1)
+                self.assertEqual(top[0][0], 321)
+                self.assertAlmostEqual(top[0][1], 1.0, places=5)
+
+
+class GpuBatchSearchTest(unittest.TestCase):
+    """The GPU branch of batch_semantic_search, run here on a CPU index, agrees with the CPU path."""
+
+    def setUp(self):
+        self.client = EmbeddingClient()
+        vectors = unit_vectors(12, 8, seed=5)
+        self.embeddings = dict(zip(["q0", "q1"] + [f"c{i}" for i in range(10)], vectors))
+        self.embeddings["missing"] = np.full(8, np.nan, dtype=np.float32)
+        self.embeddings["zero"] = np.zeros(8, dtype=np.float32)
+        self.client.get_embeddings_batch = lambda texts, use_cache=True: np.array(
+            [self.embeddings[text] for text in texts], dtype=np.float32)
+        self.queries = ["q0", "missing", "zero", "q1"]
+        self.candidates = [f"c{i}" for i in range(10)] + ["missing"]
+
+    def search(self, gpu, top_k):
+        with mock.patch.object(EmbeddingClient, "_get_gpu_resources", return_value=object() if gpu else None), \
+                mock.patch.object(faiss, "index_cpu_to_gpu", lambda resources, device, index: index, create=True):
+            return self.client.batch_semantic_search(self.queries, self.candidates, top_k=top_k)
+
+    def test_gpu_results_match_cpu_results(self):
+        for top_k in (0, 3, 20):
+            with self.subTest(top_k=top_k):
+                gpu, cpu = self.search(True, top_k), self.search(False, top_k)
+                self.assertEqual([[i for i, _, _ in row] for row in gpu], [[i for i, _, _ in row] for row in cpu])
+                for gpu_row, cpu_row in zip(gpu, cpu):
+                    for (_, a, _), (_, b, _) in zip(gpu_row, cpu_row):
+                        self.assertAlmostEqual(a, b, places=5)
+
+    def test_gpu_index_is_reused_for_the_same_candidates(self):
+        self.search(True, 3)
+        cached = self.client._gpu_candidate_index
+        self.search(True, 3)
+        self.assertIs(self.client._gpu_candidate_index, cached)
+        self.candidates = self.candidates[:-1]
+        self.search(True, 3)
+        self.assertIsNot(self.client._gpu_candidate_index, cached)
+
+
+class EmbeddingCacheTest(unittest.TestCase):
+    """LRU + TTL cache over the rows of one float32 matrix."""
+
+    def vector(self, value, dimension=4):
+        return np.full(dimension, value, dtype=np.float32)
+
+    def test_least_recently_used_entry_is_evicted_and_its_row_reused(self):
+        client = EmbeddingClient(cache_max_entries=3)
+        for i, text in enumerate("abc"):
+            client._cache_put(text, self.vector(i))
+        row_of_b = client._embedding_cache[client._cache_key("b")][1]
+        self.assertIsNotNone(client._cache_get("a"))  # a becomes most recently used
+
+        client._cache_put("d", self.vector(3))
+        self.assertIsNone(client._cache_get("b"))
+        for text, value in (("a", 0), ("c", 2), ("d", 3)):
+            np.testing.assert_array_equal(client._cache_get(text), self.vector(value))
+        self.assertEqual(client._embedding_cache[client._cache_key("d")][1], row_of_b)
+
+        stats = client.get_cache_stats()
+        self.assertEqual(stats["cache_size"], 3)
+        self.assertEqual(stats["cache_capacity_rows"], 3)
+        self.assertEqual(stats["cache_free_rows"], 0)
+        self.assertEqual(client._cache_rows_used, 3)
+
+    def test_matrix_never_grows_past_max_entries(self):
+        client = EmbeddingClient(cache_max_entries=20)
+        for i in range(100):
+            client._cache_put(f"t{i}", self.vector(i))
+        self.assertEqual(client._cache_matrix.shape, (20, 4))
+        self.assertEqual(len(client._embedding_cache), 20)
+        positions, matrix = client._cache_get_many([f"t{i}" for i in range(75, 100)])
+        self.assertEqual(positions, list(range(5, 25)))
+        np.testing.assert_array_equal(matrix[:, 0], np.arange(80, 100, dtype=np.float32))
+
+    def test_expired_rows_are_freed_and_reused(self):
+        client = EmbeddingClient(cache_max_entries=4, cache_ttl=-1)
+        client._cache_put("a", self.vector(1))
+        self.assertIsNone(client._cache_get("a"))
+        self.assertEqual(client.get_cache_stats()["cache_free_rows"], 1)
+        client._cache_put("b", self.vector(2))
+        self.assertEqual(client._cache_rows_used, 1)
+        self.assertEqual(client.get_cache_stats()["cache_free_rows"], 0)
+
+    def test_reads_are_copies_and_mismatched_dimensions_are_skipped(self):
+        client = EmbeddingClient()
+        client._cache_put("a", self.vector(1))
+        client._cache_get("a")[:] = 9
+        np.testing.assert_array_equal(client._cache_get("a"), self.vector(1))
+        client._cache_put("b", self.vector(1, dimension=8))
+        self.assertIsNone(client._cache_get("b"))
+        self.assertIsNone(client.get_cached_matrix(["a", "b"]))
+
+    def test_disabled_cache_stores_nothing(self):
+        client = EmbeddingClient(cache_max_entries=0)
+        client._cache_put("a", self.vector(1))
+        self.assertIsNone(client._cache_get("a"))
+        self.assertEqual(client.get_cache_stats()["cache_memory_estimate"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+from collections import OrderedDict
+
+import orjson
+
+from nodes.manual_summarizer_node import ManualSummarizerNode, _is_table
+
+
+def summary_type(raw_result):
+    return orjson.loads(ManualSummarizerNode().summarize({"raw_result": raw_result})["summary"])["type"]
+
+
+class ManualSummarizerTest(unittest.TestCase):
+
+    def test_is_table(self):
+        self.assertTrue(_is_table([{"name": "a"}, {"name": "b"}]))
+        self.assertTrue(_is_table([{"name": "a"}, OrderedDict(name="b")]))
+        self.assertFalse(_is_table([]))
+        self.assertFalse(_is_table([{"name": "a"}, "b"]))
+        self.assertFalse(_is_table({"name": "a"}))
+
+    def test_summary_types(self):
+        self.assertEqual(summary_type([{"name": "a"}]), "table")
+        self.assertEqual(summary_type([]), "message")
+        self.assertEqual(summary_type([{"name": "a"}, 1]), "key_value")
+        self.assertEqual(summary_type(None), "error")
+
+
+if __name__ == "__main__":
+    unittest.main()
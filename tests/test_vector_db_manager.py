@@ -0,0 +1,51 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from database.vector_db_manager import VectorDBManager  # noqa: E402
+
+
+class FakeEmbeddingClient:
+    """Batch requests fail as a whole when any text is 'bad'; single requests fail only for that text."""
+
+    def get_embeddings_batch(self, texts, use_cache=True):
+        if any(text.startswith("bad") for text in texts):
+            return np.full((len(texts), 4), np.nan, dtype=np.float32)
+        return np.array([self.get_embedding(text) for text in texts], dtype=np.float32)
+
+    def get_embedding(self, text, use_cache=True):
+        if text.startswith("bad"):
+            return np.empty(0, dtype=np.float32)
+        return np.full(4, 0.5, dtype=np.float32)
+
+
+class StoreEmbeddingsBatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.manager = VectorDBManager(os.path.join(self.directory, "test.db"))
+        self.manager.embedding_client = FakeEmbeddingClient()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_failed_batch_is_retried_one_text_at_a_time(self):
+        items = [(f"question {i}", f"MATCH ({i})") for i in range(30)] + [("bad question", None)]
+        self.assertEqual(self.manager.store_embeddings_batch("example", items), 30)
+        self.assertEqual(self.manager.count("example"), 30)
+
+    def test_database_errors_are_reported_not_raised(self):
+        with sqlite3.connect(self.manager.db_path) as conn:
+            conn.execute("DROP TABLE vector_embeddings")
+        self.assertEqual(self.manager.store_embeddings_batch("example", [("question", "MATCH (n)")]), 0)
+        self.assertFalse(self.manager.store_embedding("example", "question", "MATCH (n)"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,37 +1,368 @@
+import asyncio
+import httpx
 import openai
 import numpy as np
-from typing import List, Dict, Tuple, Optional, Union, Literal
+from typing import List, Dict, Tuple, Optional, Union, Literal, Hashable
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import itertools
 import json
 import os
+import threading
+import time
 from dotenv import load_dotenv
-from scipy.spatial.distance import cosine, euclidean, cityblock
-from sklearn.metrics.pairwise import cosine_similarity, euclidean_distances
+from scipy.spatial.distance import euclidean, cityblock
+from sklearn.metrics.pairwise import euclidean_distances
 import faiss
+import math
 import warnings
 
+try:
+    # 可选依赖: SimSIMD 提供 AVX2/AVX-512/NEON/SVE 加速的距离计算, 未安装时使用 numpy / scipy
+    import simsimd
+except ImportError:
+    simsimd = None
+
+try:
+    # 可选依赖: xxhash 提供比SHA-256快得多的非加密哈希, 用作缓存key; 未安装时使用SHA-256
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    # 可选依赖: numba 将下面的单遍循环编译为机器码
+    from numba import njit, prange
+except ImportError:
+    njit = prange = None
+
 # Load environment variables
 load_dotenv()
 
 
+def _pearson_loop(x, y):
+    """Pearson correlation in one pass over both vectors (sums accumulated in float64)."""
+    n = x.shape[0]
+    sum_x = 0.0
+    sum_y = 0.0
+    sum_xx = 0.0
+    sum_yy = 0.0
+    sum_xy = 0.0
+    for i in range(n):
+        xi = float(x[i])
+        yi = float(y[i])
+        sum_x += xi
+        sum_y += yi
+        sum_xx += xi * xi
+        sum_yy += yi * yi
+        sum_xy += xi * yi
+    if n == 0:
+        return 0.0
+    var_x = sum_xx - sum_x * sum_x / n
+    var_y = sum_yy - sum_y * sum_y / n
+    if var_x <= 0.0 or var_y <= 0.0:
+        return 0.0
+    return (sum_xy - sum_x * sum_y / n) / (var_x * var_y) ** 0.5
+
+
+if njit is not None:
+    _JIT_SIGNATURE = 'f8(f4[::1], f4[::1])'
+    _pearson_f32 = njit(_JIT_SIGNATURE, fastmath=True, cache=True)(_pearson_loop)
+
+    # batch_semantic_search 的成对皮尔逊相关: 外层循环按查询并行, 内层直接调用上面的单遍内核
+    # (jaccard / hamming 的批量计算使用下面的符号位 popcount, 不需要成对内核)
+    @njit('void(f4[:, ::1], f4[:, ::1], f8[:, ::1])', parallel=True, fastmath=True, cache=True)
+    def _pairwise_pearson(queries, candidates, out):
+        for i in prange(queries.shape[0]):
+            for j in range(candidates.shape[0]):
+                out[i, j] = _pearson_f32(queries[i], candidates[j])
+else:
+    _pearson_f32 = None
+    _pairwise_pearson = None
+
+# 每个字节的置位个数; numpy < 2.0 没有 np.bitwise_count 时查表
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _pack_signs(matrix: np.ndarray) -> np.ndarray:
+    """Pack the signs (x > 0) of the last axis into uint64 words, zero-padded to a whole word."""
+    packed = np.packbits(matrix > 0, axis=-1)
+    padding = -packed.shape[-1] % 8
+    if padding:
+        packed = np.concatenate([packed, np.zeros(packed.shape[:-1] + (padding,), dtype=np.uint8)], axis=-1)
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+
+def _popcount(words: np.ndarray) -> np.ndarray:
+    """Number of set bits per row of a uint64 word array (summed over the last axis)."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+    return _POPCOUNT_TABLE[words.view(np.uint8)].sum(axis=-1, dtype=np.int64)
+
+
+def _binary_similarity(query_bits: np.ndarray, candidate_bits: np.ndarray,
+                       dimension: int, method: str) -> np.ndarray:
+    """Jaccard / hamming similarity of packed sign bits: one AND/OR/XOR + popcount per 64 components."""
+    if method == 'jaccard':
+        intersection = _popcount(candidate_bits & query_bits)
+        union = _popcount(candidate_bits | query_bits)
+        return np.divide(intersection, union, out=np.zeros(union.shape), where=union > 0)
+    if dimension == 0:
+        return np.zeros(candidate_bits.shape[:-1])
+    return 1.0 - _popcount(candidate_bits ^ query_bits) / dimension
+
+
 class EmbeddingClient:
     """
     Client for OpenAI embedding API with advanced vector operations and similarity metrics.
     """
 
-    def __init__(self, model_name: str = "text-embedding-3-small"):
+    # 显式超时, 避免默认的600秒挂起
+    REQUEST_TIMEOUT = httpx.Timeout(10.0, connect=2.0)
+    CONNECTION_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20)
+
+    # assume_normalized 时, 平方范数与1的差在此范围内才把点积直接当作余弦相似度
+    UNIT_NORM_TOLERANCE = 1e-3
+
+    # FAISS索引选择: 小集合精确搜索, 大集合HNSW, 超大集合IVF
+    FAISS_HNSW_MIN_CANDIDATES = 1000
+    FAISS_IVF_MIN_CANDIDATES = 1_000_000
+    # 所有HNSW索引 (build_ann_index 及候选集合索引) 共用的参数
+    FAISS_HNSW_M = 32
+    FAISS_HNSW_EF_SEARCH = 64
+    FAISS_HNSW_EF_CONSTRUCTION = 200
+    FAISS_IVF_NPROBE = 16
+    # IVF训练时每个聚类最多采样的点数 (k-means 的训练集上限)
+    FAISS_IVF_MAX_POINTS_PER_CENTROID = 256
+    # 压缩索引 (compression='pq') 的参数: 子量化器个数与每个子量化器的位数
+    FAISS_PQ_M = 64
+    FAISS_PQ_NBITS = 8
+
+    # 所有实例共用一个同步OpenAI客户端(及其连接池), 新实例无需重新进行TLS握手
+    _shared_openai_client = None
+    _shared_openai_client_lock = threading.Lock()
+
+    # GPU资源在进程内共享; faiss-cpu 或没有CUDA设备时为 None
+    _gpu_resources = None
+    _gpu_checked = False
+    _gpu_lock = threading.Lock()
+    # GPU flat 索引单次查询允许的最大 k
+    GPU_MAX_TOP_K = 2048
+
+    @classmethod
+    def _get_gpu_resources(cls):
+        """Return shared faiss GPU resources, or None when FAISS has no GPU support or no GPU is visible."""
+        with cls._gpu_lock:
+            if not cls._gpu_checked:
+                cls._gpu_checked = True
+                if hasattr(faiss, "StandardGpuResources") and faiss.get_num_gpus() > 0:
+                    cls._gpu_resources = faiss.StandardGpuResources()
+            return cls._gpu_resources
+
+    @classmethod
+    def _get_openai_client(cls) -> openai.OpenAI:
+        """Return the process-wide OpenAI client, creating it on first use."""
+        with cls._shared_openai_client_lock:
+            if cls._shared_openai_client is None:
+                cls._shared_openai_client = openai.OpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    timeout=cls.REQUEST_TIMEOUT,
+                    http_client=httpx.Client(timeout=cls.REQUEST_TIMEOUT, limits=cls.CONNECTION_LIMITS)
+                )
+            return cls._shared_openai_client
+
+    def __init__(self, model_name: str = "text-embedding-3-small",
+                 cache_max_entries: int = 4096, cache_ttl: int = 3600,
+                 batch_size: int = 64, max_concurrency: int = 4,
+                 assume_normalized: Optional[bool] = None):
         """
         Initialize the embedding client.
 
         Args:
             model_name (str): OpenAI embedding model name
+            cache_max_entries (int): Maximum number of cached embeddings (LRU eviction)
+            cache_ttl (int): Time to live of a cached embedding in seconds
+            batch_size (int): Maximum number of texts sent in one embeddings request
+            max_concurrency (int): Maximum number of batch requests in flight at once
+            assume_normalized (bool): Whether the model returns unit-length vectors, so cosine
+                similarity is a plain dot product. Defaults to True for OpenAI
+                text-embedding-* models; otherwise embeddings are normalized when fetched.
         """
         self.model_name = model_name
-        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self._auto_normalized = assume_normalized is None
+        self.assume_normalized = self._model_is_normalized(model_name) if assume_normalized is None else assume_normalized
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.client = self._get_openai_client()
+        # 异步客户端在首次使用时创建 (其连接池绑定事件循环, 因此不在实例间共享)
+        self._async_client = None
         
-        # 缓存已计算的embedding以避免重复计算
-        self._embedding_cache = {}
+        # 缓存已计算的embedding以避免重复计算 (LRU + TTL, key为64位xxh3整数, 无xxhash时为SHA-256)
+        # 向量按行存放在一个连续的 float32 矩阵中, 字典只记录行号; 保存原文用于排除哈希碰撞
+        self._embedding_cache = OrderedDict()  # key -> (expires_at, row, text)
+        self._cache_matrix = np.empty((0, 0), dtype=np.float32)
+        self._cache_free_rows = []  # 被淘汰/过期条目留下的空行, 插入时优先复用
+        self._cache_rows_used = 0  # 矩阵中已分配过的行数
+        self._cache_max_entries = cache_max_entries
+        self._cache_ttl = cache_ttl
+        self._cache_seed = xxhash.xxh3_64_intdigest(model_name.encode('utf-8')) if xxhash is not None else 0
+        self._cache_lock = threading.Lock()
+
+        # FAISS索引缓存: 调用方以 cache_key (如 (集合名, 版本)) 标识候选集合, 同一key重复查询时不再重建索引
+        self._faiss_indices = OrderedDict()  # (cache_key, method, compression) -> (index, valid_indices)
+        self._faiss_max_indices = 8
+        # 候选集合转换后的float32矩阵, 同一 cache_key 重复查询时不再逐元素复制
+        self._stacked_candidates = OrderedDict()  # cache_key -> (matrix, valid_indices)
+        self._named_faiss_indices = {}  # name -> (method, index, valid_indices, candidate count)
+        self._faiss_lock = threading.Lock()
+        # batch_semantic_search 的GPU索引: ((model, 候选数, 候选文本哈希), index), 候选集不变时数据留在显存
+        self._gpu_candidate_index = None
+        # 同一份GPU资源不支持多线程同时使用, 建索引与搜索都在锁内进行
+        self._gpu_index_lock = threading.Lock()
+
+    @property
+    def async_client(self) -> openai.AsyncOpenAI:
+        """Async OpenAI client used by aget_embedding / aget_embeddings_batch / asemantic_search."""
+        if self._async_client is None:
+            self._async_client = openai.AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                timeout=self.REQUEST_TIMEOUT,
+                http_client=httpx.AsyncClient(timeout=self.REQUEST_TIMEOUT, limits=self.CONNECTION_LIMITS)
+            )
+        return self._async_client
+
+    def _cache_key(self, text: str) -> Union[int, str]:
+        """Build the cache key; the model name is part of it so different models never collide."""
+        if xxhash is not None:
+            # 模型名作为种子, 无需拼接字符串
+            return xxhash.xxh3_64_intdigest(text.encode('utf-8'), seed=self._cache_seed)
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode('utf-8')).hexdigest()
+
+    def _cache_row(self, key: Union[int, str], text: str, now: float) -> Optional[int]:
+        """Return the matrix row of a live cache entry, dropping it if expired. Caller holds the lock."""
+        entry = self._embedding_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, row, cached_text = entry
+        if cached_text != text:
+            return None  # 哈希碰撞: 视为未命中
+        if expires_at < now:
+            del self._embedding_cache[key]
+            self._cache_free_rows.append(row)
+            return None
+        self._embedding_cache.move_to_end(key)
+        return row
+
+    def _cache_get(self, text: str) -> Optional[np.ndarray]:
+        """Return a copy of a cached embedding, or None on a miss or an expired entry."""
+        key = self._cache_key(text)
+        with self._cache_lock:
+            row = self._cache_row(key, text, time.monotonic())
+            # 复制一份: 该行在条目被淘汰后会被复用
+            return None if row is None else self._cache_matrix[row].copy()
 
-    def get_embedding(self, text: str, use_cache: bool = True) -> List[float]:
+    def _cache_get_many(self, texts: List[str]) -> Tuple[List[int], np.ndarray]:
+        """
+        Look up many texts at once.
+
+        Returns:
+            Tuple[List[int], np.ndarray]: positions in texts that hit the cache, and their
+            embeddings gathered from the cache matrix into one (hits, d) array
+        """
+        keys = [self._cache_key(text) for text in texts]
+        positions, rows = [], []
+        with self._cache_lock:
+            now = time.monotonic()
+            for i, (key, text) in enumerate(zip(keys, texts)):
+                row = self._cache_row(key, text, now)
+                if row is not None:
+                    positions.append(i)
+                    rows.append(row)
+            # 一次花式索引从连续矩阵中取出所有命中行, 不逐个拼接向量
+            return positions, self._cache_matrix[rows]
+
+    def _cache_put(self, text: str, embedding: np.ndarray):
+        """Store an embedding, evicting the least recently used entries when full."""
+        if embedding.size == 0 or self._cache_max_entries <= 0:
+            return
+        key = self._cache_key(text)
+        with self._cache_lock:
+            if self._cache_matrix.shape[1] != embedding.shape[0]:
+                if self._embedding_cache:
+                    return  # 维度与缓存中的向量不一致, 不缓存
+                self._cache_matrix = np.empty((0, embedding.shape[0]), dtype=np.float32)
+                self._cache_free_rows = []
+                self._cache_rows_used = 0
+
+            entry = self._embedding_cache.pop(key, None)
+            if entry is not None:
+                row = entry[1]
+            else:
+                # 缓存已满时先淘汰最久未使用的条目, 其行直接留给新向量
+                while len(self._embedding_cache) >= self._cache_max_entries:
+                    _, (_, evicted_row, _) = self._embedding_cache.popitem(last=False)
+                    self._cache_free_rows.append(evicted_row)
+                if self._cache_free_rows:
+                    row = self._cache_free_rows.pop()
+                else:
+                    row = self._cache_rows_used
+                    if row == self._cache_matrix.shape[0]:
+                        # 容量按2的幂翻倍增长 (不超过 cache_max_entries), 摊销后每次插入O(1)
+                        capacity = min(max(16, 2 * row), self._cache_max_entries)
+                        grown = np.empty((capacity, embedding.shape[0]), dtype=np.float32)
+                        grown[:row] = self._cache_matrix
+                        self._cache_matrix = grown
+                    self._cache_rows_used += 1
+
+            self._cache_matrix[row] = embedding
+            self._embedding_cache[key] = (time.monotonic() + self._cache_ttl, row, text)
+
+    def get_cached_matrix(self, texts: List[str]) -> Optional[np.ndarray]:
+        """
+        Return the cached embeddings of texts as one (len(texts), d) float32 matrix,
+        gathered straight from the cache storage (e.g. to feed a FAISS index).
+
+        Args:
+            texts (List[str]): Texts whose embeddings should already be cached
+
+        Returns:
+            Optional[np.ndarray]: The embedding matrix, or None if any text is not cached
+        """
+        positions, matrix = self._cache_get_many(texts)
+        if len(positions) != len(texts):
+            return None
+        return matrix
+
+    def set_model_name(self, model_name: str):
+        """
+        Switch the embedding model. Cached vectors from the old model are dropped,
+        since embeddings from different models are not comparable.
+
+        Args:
+            model_name (str): OpenAI embedding model name
+        """
+        if model_name != self.model_name:
+            self.model_name = model_name
+            self._cache_seed = xxhash.xxh3_64_intdigest(model_name.encode('utf-8')) if xxhash is not None else 0
+            if self._auto_normalized:
+                self.assume_normalized = self._model_is_normalized(model_name)
+            self.clear_cache()
+
+    @staticmethod
+    def _model_is_normalized(model_name: str) -> bool:
+        """OpenAI text-embedding-* models return embeddings normalized to length 1."""
+        return model_name.startswith("text-embedding-")
+
+    def _to_vector(self, embedding: List[float]) -> np.ndarray:
+        """Convert an API embedding to float32, normalizing it once here unless the model already does."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        if not self.assume_normalized:
+            norm = np.linalg.norm(vector)
+            if norm > 0:
+                vector /= norm
+        return vector
+
+    def get_embedding(self, text: str, use_cache: bool = True) -> np.ndarray:
         """
         Get embedding for a single text.
 
@@ -40,27 +371,93 @@ class EmbeddingClient:
             use_cache (bool): Whether to use caching
 
         Returns:
-            List[float]: Embedding vector
+            np.ndarray: (d,) float32 embedding vector, empty on failure
         """
-        if use_cache and text in self._embedding_cache:
-            return self._embedding_cache[text]
+        if use_cache:
+            cached = self._cache_get(text)
+            if cached is not None:
+                return cached
             
         try:
             response = self.client.embeddings.create(
                 model=self.model_name,
                 input=text
             )
-            embedding = response.data[0].embedding
+            embedding = self._to_vector(response.data[0].embedding)
             
             if use_cache:
-                self._embedding_cache[text] = embedding
+                self._cache_put(text, embedding)
                 
             return embedding
         except Exception as e:
             print(f"Error getting embedding: {e}")
-            return []
+            return np.empty(0, dtype=np.float32)
+
+    async def aget_embedding(self, text: str, use_cache: bool = True) -> np.ndarray:
+        """
+        Async version of get_embedding.
+
+        Args:
+            text (str): Text to embed
+            use_cache (bool): Whether to use caching
+
+        Returns:
+            np.ndarray: (d,) float32 embedding vector, empty on failure
+        """
+        if use_cache:
+            cached = self._cache_get(text)
+            if cached is not None:
+                return cached
+
+        try:
+            response = await self.async_client.embeddings.create(
+                model=self.model_name,
+                input=text
+            )
+            embedding = self._to_vector(response.data[0].embedding)
+
+            if use_cache:
+                self._cache_put(text, embedding)
+
+            return embedding
+        except Exception as e:
+            print(f"Error getting embedding: {e}")
+            return np.empty(0, dtype=np.float32)
 
-    def get_embeddings_batch(self, texts: List[str], use_cache: bool = True) -> List[List[float]]:
+    def _chunk_texts(self, texts: List[str]):
+        """Yield consecutive slices of at most batch_size texts."""
+        iterator = iter(texts)
+        while True:
+            chunk = list(itertools.islice(iterator, self.batch_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def _embed_chunk(self, texts: List[str]) -> List[np.ndarray]:
+        """Embed one chunk in a single request; a failed chunk yields empty vectors."""
+        try:
+            response = self.client.embeddings.create(
+                model=self.model_name,
+                input=texts
+            )
+            return [self._to_vector(data.embedding) for data in response.data]
+        except Exception as e:
+            print(f"Error getting batch embeddings: {e}")
+            return [np.empty(0, dtype=np.float32) for _ in texts]
+
+    async def _aembed_chunk(self, texts: List[str]) -> List[np.ndarray]:
+        """Async version of _embed_chunk."""
+        try:
+            response = await self.async_client.embeddings.create(
+                model=self.model_name,
+                input=texts
+            )
+            return [self._to_vector(data.embedding) for data in response.data]
+        except Exception as e:
+            print(f"Error getting batch embeddings: {e}")
+            return [np.empty(0, dtype=np.float32) for _ in texts]
+
+    def get_embeddings_batch(self, texts: List[str], use_cache: bool = True) -> np.ndarray:
         """
         Get embeddings for multiple texts in batch.
 
@@ -69,46 +466,136 @@ class EmbeddingClient:
             use_cache (bool): Whether to use caching
 
         Returns:
-            List[List[float]]: List of embedding vectors
+            np.ndarray: (len(texts), d) float32 matrix; rows of texts that could not be embedded are NaN
         """
-        # 分离已缓存和未缓存的文本
-        cached_embeddings = []
-        uncached_texts = []
-        uncached_indices = []
+        cached_embeddings, uncached_texts, uncached_indices = self._split_cached(texts, use_cache)
         
-        for i, text in enumerate(texts):
-            if use_cache and text in self._embedding_cache:
-                cached_embeddings.append(self._embedding_cache[text])
+        # 获取未缓存文本的embedding: 按batch_size分块, 多个请求并发发送
+        new_embeddings = []
+        if uncached_texts:
+            chunks = list(self._chunk_texts(uncached_texts))
+            if len(chunks) == 1:
+                chunk_results = [self._embed_chunk(chunks[0])]
             else:
-                uncached_texts.append(text)
-                uncached_indices.append(i)
-        
-        # 获取未缓存文本的embedding
+                with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(chunks))) as executor:
+                    # map() keeps the chunk order, so results line up with uncached_texts
+                    chunk_results = list(executor.map(self._embed_chunk, chunks))
+            new_embeddings = [embedding for chunk in chunk_results for embedding in chunk]
+
+        return self._assemble_batch(len(texts), cached_embeddings, uncached_texts,
+                                    uncached_indices, new_embeddings, use_cache)
+
+    async def aget_embeddings_batch(self, texts: List[str], use_cache: bool = True) -> np.ndarray:
+        """
+        Async version of get_embeddings_batch; chunks are sent concurrently with asyncio.gather.
+
+        Args:
+            texts (List[str]): List of texts to embed
+            use_cache (bool): Whether to use caching
+
+        Returns:
+            np.ndarray: (len(texts), d) float32 matrix; rows of texts that could not be embedded are NaN
+        """
+        cached_embeddings, uncached_texts, uncached_indices = self._split_cached(texts, use_cache)
+
+        new_embeddings = []
         if uncached_texts:
-            try:
-                response = self.client.embeddings.create(
-                    model=self.model_name,
-                    input=uncached_texts
-                )
-                new_embeddings = [data.embedding for data in response.data]
-                
-                # 缓存新的embedding
-                if use_cache:
-                    for text, embedding in zip(uncached_texts, new_embeddings):
-                        self._embedding_cache[text] = embedding
-            except Exception as e:
-                print(f"Error getting batch embeddings: {e}")
-                new_embeddings = [[] for _ in uncached_texts]
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+
+            async def embed(chunk: List[str]) -> List[np.ndarray]:
+                async with semaphore:
+                    return await self._aembed_chunk(chunk)
+
+            # gather() keeps the chunk order, so results line up with uncached_texts
+            chunk_results = await asyncio.gather(*(embed(chunk) for chunk in self._chunk_texts(uncached_texts)))
+            new_embeddings = [embedding for chunk in chunk_results for embedding in chunk]
+
+        return self._assemble_batch(len(texts), cached_embeddings, uncached_texts,
+                                    uncached_indices, new_embeddings, use_cache)
+
+    def _split_cached(self, texts: List[str], use_cache: bool):
+        """Split texts into cached (positions, matrix) and the texts that still need a request."""
+        # 分离已缓存和未缓存的文本
+        if use_cache:
+            cached_indices, cached_matrix = self._cache_get_many(texts)
+        else:
+            cached_indices, cached_matrix = [], np.empty((0, 0), dtype=np.float32)
+        hits = set(cached_indices)
+        uncached_indices = [i for i in range(len(texts)) if i not in hits]
+        uncached_texts = [texts[i] for i in uncached_indices]
+        return (cached_indices, cached_matrix), uncached_texts, uncached_indices
+
+    def _assemble_batch(self, count: int, cached_embeddings: Tuple[List[int], np.ndarray],
+                        uncached_texts: List[str], uncached_indices: List[int],
+                        new_embeddings: List[np.ndarray], use_cache: bool) -> np.ndarray:
+        """Cache freshly fetched embeddings and merge everything into one (count, d) matrix."""
+        # 缓存新的embedding
+        if use_cache:
+            for text, embedding in zip(uncached_texts, new_embeddings):
+                self._cache_put(text, embedding)
         
-        # 合并结果
-        result = [None] * len(texts)
-        for i, embedding in enumerate(cached_embeddings):
-            result[i] = embedding
-        for i, embedding in zip(uncached_indices, new_embeddings):
-            result[i] = embedding
-            
+        # 合并结果: 写入一个连续的 (N, d) float32 矩阵
+        cached_indices, cached_matrix = cached_embeddings
+        placed = [(i, emb) for i, emb in zip(uncached_indices, new_embeddings) if emb.size]
+        if cached_indices:
+            dimension = cached_matrix.shape[1]
+        else:
+            dimension = placed[0][1].shape[0] if placed else 0
+        result = np.full((count, dimension), np.nan, dtype=np.float32)
+        if cached_indices:
+            result[cached_indices] = cached_matrix
+        for i, embedding in placed:
+            if embedding.shape[0] == dimension:
+                result[i] = embedding
+
         return result
 
+    @staticmethod
+    def _valid_candidates(candidate_embeddings: Union[List[List[float]], np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Stack candidates into a float32 matrix, dropping empty / NaN rows.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (valid row matrix, original index of each valid row)
+        """
+        if isinstance(candidate_embeddings, np.ndarray) and candidate_embeddings.ndim == 2:
+            matrix = candidate_embeddings.astype(np.float32, copy=False)
+            if matrix.shape[1] == 0:
+                return np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=np.int64)
+            valid_indices = np.flatnonzero(~np.isnan(matrix).any(axis=1))
+            if len(valid_indices) == len(matrix):
+                return matrix, valid_indices
+            return matrix[valid_indices], valid_indices
+
+        valid_indices = [i for i, emb in enumerate(candidate_embeddings) if len(emb)]
+        if not valid_indices:
+            return np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=np.int64)
+        matrix = np.array([candidate_embeddings[i] for i in valid_indices], dtype=np.float32)
+        return matrix, np.asarray(valid_indices)
+
+    def _stack_candidates(self, candidate_embeddings: Union[List[List[float]], np.ndarray],
+                          cache_key: Optional[Hashable] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        _valid_candidates with reuse: the stacked matrix is kept while the same cache_key is passed
+        again. The key must identify the contents (e.g. (collection name, version)), since the
+        candidates themselves are not compared; without a key nothing is cached.
+        """
+        if cache_key is None:
+            return self._valid_candidates(candidate_embeddings)
+        with self._faiss_lock:
+            entry = self._stacked_candidates.get(cache_key)
+            if entry is not None:
+                self._stacked_candidates.move_to_end(cache_key)
+                return entry
+
+        matrix, valid_indices = self._valid_candidates(candidate_embeddings)
+        with self._faiss_lock:
+            self._stacked_candidates[cache_key] = (matrix, valid_indices)
+            self._stacked_candidates.move_to_end(cache_key)
+            while len(self._stacked_candidates) > self._faiss_max_indices:
+                self._stacked_candidates.popitem(last=False)
+        return matrix, valid_indices
+
     def calculate_similarity(self, vec1: Union[List[float], np.ndarray], 
                            vec2: Union[List[float], np.ndarray],
                            method: Literal['cosine', 'euclidean', 'manhattan', 'dot_product', 
@@ -122,7 +609,9 @@ class EmbeddingClient:
             method: Similarity calculation method
 
         Returns:
-            float: Similarity score
+            float: Similarity score. 'cosine' / 'dot_product' always return the true cosine;
+            with assume_normalized the norm division is only skipped when both vectors
+            already have unit length (within UNIT_NORM_TOLERANCE).
         """
         # 转换为numpy数组
         vec1 = np.array(vec1, dtype=np.float32)
@@ -131,13 +620,27 @@ class EmbeddingClient:
         if len(vec1) != len(vec2):
             return 0.0
         
-        if method == 'cosine':
-            # 余弦相似度 - 最常用的文本相似度度量
-            return 1 - cosine(vec1, vec2)
+        if method in ('cosine', 'dot_product'):
+            # 余弦相似度 - 最常用的文本相似度度量; 归一化点积与其相同, 共用一个分支
+            dot_product = float(np.dot(vec1, vec2))
+            if simsimd is not None and not self.assume_normalized:
+                return 1.0 - float(simsimd.cosine(vec1, vec2))
+            # vdot(a, a) 即平方范数, 比 scipy cosine / 两次 norm 少分配临时数组
+            squared_norm1 = float(np.vdot(vec1, vec1))
+            squared_norm2 = float(np.vdot(vec2, vec2))
+            if (self.assume_normalized and abs(squared_norm1 - 1.0) <= self.UNIT_NORM_TOLERANCE
+                    and abs(squared_norm2 - 1.0) <= self.UNIT_NORM_TOLERANCE):
+                # 单位向量的余弦相似度就是点积, 无需开方和除法; 非单位向量仍按范数归一化
+                return dot_product
+            denominator = math.sqrt(squared_norm1 * squared_norm2)
+            return 0.0 if denominator == 0 else dot_product / denominator
             
         elif method == 'euclidean':
             # 欧几里得距离 - 转换为相似度 (1 / (1 + distance))
-            distance = euclidean(vec1, vec2)
+            if simsimd is not None:
+                distance = math.sqrt(float(simsimd.sqeuclidean(vec1, vec2)))
+            else:
+                distance = euclidean(vec1, vec2)
             return 1 / (1 + distance)
             
         elif method == 'manhattan':
@@ -145,20 +648,21 @@ class EmbeddingClient:
             distance = cityblock(vec1, vec2)
             return 1 / (1 + distance)
             
-        elif method == 'dot_product':
-            # 点积 - 需要归一化
-            dot_product = np.dot(vec1, vec2)
-            norm1 = np.linalg.norm(vec1)
-            norm2 = np.linalg.norm(vec2)
-            if norm1 == 0 or norm2 == 0:
-                return 0.0
-            return dot_product / (norm1 * norm2)
-            
         elif method == 'pearson':
             # 皮尔逊相关系数
-            if np.std(vec1) == 0 or np.std(vec2) == 0:
+            if _pearson_f32 is not None:
+                return _pearson_f32(vec1, vec2)
+            # 闭式单遍公式, 不构造 corrcoef 的 2x2 协方差矩阵; float64 累加避免相减时的精度损失
+            x = vec1.astype(np.float64)
+            y = vec2.astype(np.float64)
+            n = x.size
+            sum_x = x.sum()
+            sum_y = y.sum()
+            var_x = n * np.dot(x, x) - sum_x * sum_x
+            var_y = n * np.dot(y, y) - sum_y * sum_y
+            if var_x <= 0 or var_y <= 0:
                 return 0.0
-            return np.corrcoef(vec1, vec2)[0, 1]
+            return float((n * np.dot(x, y) - sum_x * sum_y) / np.sqrt(var_x * var_y))
             
         elif method == 'spearman':
             # 斯皮尔曼相关系数
@@ -170,147 +674,445 @@ class EmbeddingClient:
                 
         elif method == 'jaccard':
             # Jaccard相似度 (适用于稀疏向量)
-            vec1_binary = (vec1 > 0).astype(int)
-            vec2_binary = (vec2 > 0).astype(int)
-            intersection = np.sum(vec1_binary & vec2_binary)
-            union = np.sum(vec1_binary | vec2_binary)
-            return intersection / union if union > 0 else 0.0
+            return float(_binary_similarity(_pack_signs(vec1), _pack_signs(vec2), len(vec1), method))
             
         elif method == 'hamming':
             # 汉明距离 (适用于二进制向量)
-            vec1_binary = (vec1 > 0).astype(int)
-            vec2_binary = (vec2 > 0).astype(int)
-            return 1 - np.mean(vec1_binary != vec2_binary)
+            return float(_binary_similarity(_pack_signs(vec1), _pack_signs(vec2), len(vec1), method))
             
         else:
             raise ValueError(f"Unknown similarity method: {method}")
 
-    def find_most_similar_faiss(self, query_embedding: List[float],
-                               candidate_embeddings: List[List[float]],
-                               top_k: int = 5,
-                               method: str = 'cosine') -> List[Tuple[int, float]]:
+    def score_candidates(self, query_embedding: Union[List[float], np.ndarray],
+                         candidate_matrix: np.ndarray,
+                         method: str = 'cosine',
+                         candidate_norms: Optional[np.ndarray] = None) -> np.ndarray:
         """
-        Find the most similar embeddings using FAISS for high-performance similarity search.
+        Score one query against every row of a candidate matrix in a single vectorized pass.
 
         Args:
             query_embedding: Query embedding
-            candidate_embeddings: Candidate embeddings
+            candidate_matrix: (N, d) float32 matrix of candidate embeddings
+            method: Similarity method
+            candidate_norms: Optional precomputed L2 norms of the candidate rows
+
+        Returns:
+            np.ndarray: (N,) similarity scores, 0.0 for candidates that cannot be compared
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if candidate_matrix.size == 0 or candidate_matrix.shape[1] != query.shape[0]:
+            return np.zeros(len(candidate_matrix), dtype=np.float32)
+
+        if method in ('cosine', 'dot_product') and self.assume_normalized:
+            # 单位向量: 一次矩阵-向量乘法(GEMV)即为余弦相似度
+            return candidate_matrix @ query
+        elif method in ('cosine', 'dot_product'):
+            # 一次矩阵-向量乘法(GEMV)得到所有点积，再除以预先计算好的范数
+            if candidate_norms is None:
+                candidate_norms = np.linalg.norm(candidate_matrix, axis=1)
+            dots = candidate_matrix @ query
+            denominators = candidate_norms * np.linalg.norm(query)
+            return np.divide(dots, denominators, out=np.zeros_like(dots),
+                             where=denominators > 0)
+        elif method == 'euclidean':
+            return 1 / (1 + np.linalg.norm(candidate_matrix - query, axis=1))
+        elif method == 'manhattan':
+            return 1 / (1 + np.abs(candidate_matrix - query).sum(axis=1))
+        elif method in ('jaccard', 'hamming'):
+            # 符号位打包为uint64后按位运算 + popcount
+            return _binary_similarity(_pack_signs(query), _pack_signs(candidate_matrix),
+                                      query.shape[0], method)
+        else:
+            # 其他方法逐行计算
+            return np.array([self.calculate_similarity(query, row, method)
+                             for row in candidate_matrix], dtype=np.float32)
+
+    @staticmethod
+    def _normalize_rows(candidate_matrix: np.ndarray,
+                        candidate_norms: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return a contiguous float32 copy of the matrix with unit-length rows (zero rows stay zero)."""
+        if candidate_norms is None:
+            candidate_norms = np.linalg.norm(candidate_matrix, axis=1)
+        safe_norms = np.where(candidate_norms > 0, candidate_norms, 1).astype(np.float32)
+        return np.ascontiguousarray(candidate_matrix / safe_norms[:, None], dtype=np.float32)
+
+    @staticmethod
+    def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+        """
+        Indices of the top_k highest scores, best first, via a partial sort.
+        argpartition selects the top_k in O(N); only those k are then sorted (ties keep index order).
+
+        Args:
+            scores: (N,) similarity scores
+            top_k: Number of indices to return
+
+        Returns:
+            np.ndarray: Up to top_k indices into scores
+        """
+        n = len(scores)
+        if top_k <= 0 or n == 0:
+            return np.empty(0, dtype=np.intp)
+        if top_k >= n:
+            return np.argsort(-scores, kind="stable")
+        selected = np.argpartition(-scores, top_k - 1)[:top_k]
+        selected.sort()
+        return selected[np.argsort(-scores[selected], kind="stable")]
+
+    def build_ann_index(self, candidate_matrix: np.ndarray,
+                        candidate_norms: Optional[np.ndarray] = None,
+                        m: Optional[int] = None, ef_construction: Optional[int] = None,
+                        ef_search: Optional[int] = None,
+                        method: str = 'cosine') -> faiss.Index:
+        """
+        Build an HNSW index over a candidate matrix.
+        For cosine, candidates are L2-normalized once here, so queries only need an inner product.
+
+        Args:
+            candidate_matrix: (N, d) float32 matrix of candidate embeddings
+            candidate_norms: Optional precomputed L2 norms of the candidate rows
+            m: Number of graph neighbours per node (default FAISS_HNSW_M)
+            ef_construction: Candidate list size while building (default FAISS_HNSW_EF_CONSTRUCTION)
+            ef_search: Candidate list size at query time (default FAISS_HNSW_EF_SEARCH)
+            method: 'cosine' (inner product over unit rows) or 'euclidean' (L2)
+
+        Returns:
+            faiss.Index: HNSW index whose ids are row numbers of candidate_matrix
+        """
+        if method == 'cosine':
+            vectors = self._normalize_rows(candidate_matrix, candidate_norms)
+            metric = faiss.METRIC_INNER_PRODUCT
+        else:
+            vectors = np.ascontiguousarray(candidate_matrix, dtype=np.float32)
+            metric = faiss.METRIC_L2
+
+        index = faiss.IndexHNSWFlat(vectors.shape[1], m or self.FAISS_HNSW_M, metric)
+        index.hnsw.efConstruction = ef_construction or self.FAISS_HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = ef_search or self.FAISS_HNSW_EF_SEARCH
+        index.add(vectors)
+        return index
+
+    def build_quantized_index(self, candidate_matrix: np.ndarray,
+                              candidate_norms: Optional[np.ndarray] = None) -> faiss.Index:
+        """
+        Build an exhaustive int8 scalar-quantized index for cosine search.
+        Every candidate is still scanned, but each dimension is stored in one byte instead of four,
+        so a scan moves a quarter of the memory of the float32 matrix.
+
+        Args:
+            candidate_matrix: (N, d) float32 matrix of candidate embeddings
+            candidate_norms: Optional precomputed L2 norms of the candidate rows
+
+        Returns:
+            faiss.Index: Scalar-quantized inner-product index whose ids are row numbers of candidate_matrix
+        """
+        normalized = self._normalize_rows(candidate_matrix, candidate_norms)
+
+        index = faiss.IndexScalarQuantizer(normalized.shape[1], faiss.ScalarQuantizer.QT_8bit,
+                                           faiss.METRIC_INNER_PRODUCT)
+        # 训练只统计每一维的取值范围, 用于计算量化的缩放系数
+        index.train(normalized)
+        index.add(normalized)
+        return index
+
+    def search_ann_index(self, index: faiss.Index, query_embedding: Union[List[float], np.ndarray],
+                         top_k: int) -> List[Tuple[int, float]]:
+        """
+        Query an index built by build_ann_index, build_quantized_index or build_candidate_index.
+        Inner-product indices are searched with the normalized query (cosine similarity);
+        L2 indices report distances converted to 1 / (1 + distance), as calculate_similarity does.
+
+        Args:
+            index: Index returned by build_ann_index or build_quantized_index
+            query_embedding: Query embedding
             top_k: Number of top results to return
-            method: Similarity method ('cosine', 'euclidean')
 
         Returns:
-            List[Tuple[int, float]]: List of (index, similarity_score) tuples
+            List[Tuple[int, float]]: (row, similarity) pairs, best first
         """
-        if not candidate_embeddings:
+        query = np.array(query_embedding, dtype=np.float32).reshape(1, -1)
+        if query.shape[1] != index.d or index.ntotal == 0 or top_k <= 0:
             return []
-            
+        if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            faiss.normalize_L2(query)
+        scores, indices = index.search(query, min(top_k, index.ntotal))
+
+        # 转换结果 (整体用数组运算, 不逐个构造元组)
+        found = indices[0] != -1  # FAISS返回-1表示无效结果
+        scores = scores[0][found]
+        if index.metric_type == faiss.METRIC_L2:
+            # FAISS返回的是平方距离, 开方后转换为相似度; 内积本身就是余弦相似度
+            scores = 1 / (1 + np.sqrt(np.maximum(scores, 0)))
+        return list(zip(indices[0][found].tolist(), scores.tolist()))
+
+    def _build_faiss_index(self, candidate_embeddings: Union[List[List[float]], np.ndarray],
+                           method: str, allow_approximate: bool = False,
+                           compression: str = 'none',
+                           cache_key: Optional[Hashable] = None) -> Tuple[Optional[faiss.Index], np.ndarray]:
+        """
+        Build a FAISS index over the valid candidates; for cosine, rows are normalized once here
+        unless the embeddings are already unit length (assume_normalized).
+        With allow_approximate, large collections get an HNSW (or, above a million rows, IVF) index
+        instead of an exhaustive flat one. compression 'fp16' / 'pq' stores compressed codes and
+        takes precedence over allow_approximate.
+        """
         # 过滤空embedding
-        valid_embeddings = []
-        valid_indices = []
-        for i, emb in enumerate(candidate_embeddings):
-            if emb:
-                valid_embeddings.append(emb)
-                valid_indices.append(i)
-        
-        if not valid_embeddings:
-            return []
-            
-        # 转换为numpy数组
-        embeddings_array = np.array(valid_embeddings, dtype=np.float32)
-        query_array = np.array(query_embedding, dtype=np.float32).reshape(1, -1)
-        
+        valid_embeddings, valid_indices = self._stack_candidates(candidate_embeddings, cache_key)
+        if len(valid_embeddings) == 0:
+            return None, valid_indices
+        if (compression == 'none' and allow_approximate
+                and self.FAISS_HNSW_MIN_CANDIDATES <= len(valid_embeddings) < self.FAISS_IVF_MIN_CANDIDATES):
+            # 大集合: HNSW图索引, 与 build_ann_index 使用同一套参数
+            return self.build_ann_index(valid_embeddings, method=method), valid_indices
+
         # 选择FAISS索引类型
-        if method == 'cosine':
-            # 对于余弦相似度，需要归一化向量
-            faiss.normalize_L2(embeddings_array)
-            faiss.normalize_L2(query_array)
-            index = faiss.IndexFlatIP(embeddings_array.shape[1])  # Inner Product
+        if method == 'cosine' and self.assume_normalized:
+            # 已是单位向量: 内积即余弦, 无需再归一化
+            embeddings_array = np.ascontiguousarray(valid_embeddings, dtype=np.float32)
+            metric = faiss.METRIC_INNER_PRODUCT
+        elif method == 'cosine':
+            # 对于余弦相似度，需要归一化向量 (与 build_ann_index 相同, 返回归一化后的副本)
+            embeddings_array = self._normalize_rows(valid_embeddings)
+            metric = faiss.METRIC_INNER_PRODUCT
         else:
-            index = faiss.IndexFlatL2(embeddings_array.shape[1])  # L2 distance
-        
-        # 添加向量到索引
+            embeddings_array = np.ascontiguousarray(valid_embeddings, dtype=np.float32)
+            metric = faiss.METRIC_L2
+        count, dimension = embeddings_array.shape
+
+        if compression == 'pq' and count >= 2 ** self.FAISS_PQ_NBITS:
+            # 乘积量化: 每个向量压缩为 m 个字节, 召回率有所下降
+            index = faiss.IndexPQ(dimension, self._pq_subquantizers(dimension), self.FAISS_PQ_NBITS, metric)
+            index.train(embeddings_array)
+        elif compression in ('fp16', 'pq'):
+            # 半精度存储: 内存减半, 精度损失可忽略 (样本太少无法训练PQ时也使用fp16)
+            index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, metric)
+        elif allow_approximate and count >= self.FAISS_IVF_MIN_CANDIDATES:
+            # 超大集合: 倒排索引, 每次只扫描 nprobe 个聚类
+            nlist = int(4 * np.sqrt(count))
+            quantizer = faiss.IndexFlat(dimension, metric)
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, metric)
+            index.cp.max_points_per_centroid = self.FAISS_IVF_MAX_POINTS_PER_CENTROID
+            index.train(embeddings_array)
+            index.nprobe = self.FAISS_IVF_NPROBE
+        else:
+            index = faiss.IndexFlat(dimension, metric)  # 精确搜索
+
+        # 添加向量到索引 (整个矩阵一次性添加)
         index.add(embeddings_array)
-        
-        # 搜索
-        distances, indices = index.search(query_array, min(top_k, len(valid_embeddings)))
-        
-        # 转换结果
-        results = []
-        for i, (idx, dist) in enumerate(zip(indices[0], distances[0])):
-            if idx != -1:  # FAISS返回-1表示无效结果
-                original_idx = valid_indices[idx]
-                if method == 'cosine':
-                    similarity = dist  # 内积就是余弦相似度
-                else:
-                    similarity = 1 / (1 + dist)  # 转换为相似度
-                results.append((original_idx, similarity))
-        
-        return results
+        return index, valid_indices
+
+    def _pq_subquantizers(self, dimension: int) -> int:
+        """Largest number of PQ sub-quantizers up to FAISS_PQ_M that divides the dimension."""
+        m = min(self.FAISS_PQ_M, dimension)
+        while dimension % m:
+            m -= 1
+        return m
+
+    def _get_or_build_index(self, candidate_embeddings: Union[List[List[float]], np.ndarray],
+                            method: str, compression: str = 'none',
+                            cache_key: Optional[Hashable] = None) -> Tuple[Optional[faiss.Index], np.ndarray]:
+        """
+        Return the index for a candidate collection, reusing it while the same cache_key is passed
+        again (see _stack_candidates). Without a key a flat index is built for this call only.
+        """
+        if cache_key is None:
+            return self._build_faiss_index(candidate_embeddings, method, compression=compression)
+
+        key = (cache_key, method, compression)
+        with self._faiss_lock:
+            entry = self._faiss_indices.get(key)
+            reused = entry is not None
+            if reused:
+                self._faiss_indices.move_to_end(key)
+                index, valid_indices = entry
+                # A flat index is cheapest for a one-off query; large collections that are
+                # queried again are promoted to an approximate index once
+                if index is None or index.ntotal < self.FAISS_HNSW_MIN_CANDIDATES \
+                        or not isinstance(index, faiss.IndexFlat):
+                    return index, valid_indices
+
+        index, valid_indices = self._build_faiss_index(candidate_embeddings, method, allow_approximate=reused,
+                                                       compression=compression, cache_key=cache_key)
+        with self._faiss_lock:
+            self._faiss_indices[key] = (index, valid_indices)
+            self._faiss_indices.move_to_end(key)
+            while len(self._faiss_indices) > self._faiss_max_indices:
+                self._faiss_indices.popitem(last=False)
+        return index, valid_indices
+
+    def _search_candidate_rows(self, index: Optional[faiss.Index], valid_indices: np.ndarray,
+                               query_embedding: Union[List[float], np.ndarray],
+                               top_k: int) -> List[Tuple[int, float]]:
+        """search_ann_index on an index from _build_faiss_index, with rows mapped back to candidate numbers."""
+        if index is None:
+            return []
+        ranked = self.search_ann_index(index, query_embedding, top_k)
+        if not ranked:
+            return []
+        rows, scores = zip(*ranked)
+        return list(zip(valid_indices[list(rows)].tolist(), scores))
+
+    def build_candidate_index(self, name: str,
+                              candidate_embeddings: Union[List[List[float]], np.ndarray],
+                              method: str = 'cosine',
+                              compression: Literal['none', 'fp16', 'pq'] = 'none') -> int:
+        """
+        Build a named FAISS index once so that many queries can search the same candidates.
+        Collections of FAISS_HNSW_MIN_CANDIDATES or more get an approximate (HNSW / IVF) index.
+
+        Args:
+            name: Handle used by search_candidate_index; an existing index with this name is replaced
+            candidate_embeddings: Candidate embeddings
+            method: Similarity method ('cosine', 'euclidean')
+            compression: See find_most_similar_faiss
+
+        Returns:
+            int: Number of candidates added to the index
+        """
+        index, valid_indices = self._build_faiss_index(candidate_embeddings, method,
+                                                       allow_approximate=True, compression=compression)
+        with self._faiss_lock:
+            self._named_faiss_indices[name] = (method, index, valid_indices, len(candidate_embeddings))
+        return len(valid_indices)
+
+    def add_to_candidate_index(self, name: str,
+                               chunks: List[Union[List[List[float]], np.ndarray]]) -> int:
+        """
+        Append candidates to an index built by build_candidate_index. All chunks are copied into
+        one preallocated buffer and added with a single index.add call, so the index storage grows once.
+        New candidates are numbered after the existing ones, in chunk order.
+
+        Args:
+            name: Handle passed to build_candidate_index
+            chunks: Batches of candidate embeddings
+
+        Returns:
+            int: Number of candidates added to the index
+        """
+        # 读取、index.add与写回在同一把锁内完成, search_candidate_index不会看到添加到一半的索引
+        with self._faiss_lock:
+            entry = self._named_faiss_indices.get(name)
+            if entry is None:
+                raise KeyError(f"No candidate index named '{name}'")
+            method, index, valid_indices, count = entry
+
+            # 过滤空embedding(及维度不符的批次), 并记录每个有效行在全部候选中的编号
+            dimension = index.d if index is not None else None
+            valid_chunks, new_indices = [], []
+            offset = count
+            for chunk in chunks:
+                matrix, chunk_indices = self._valid_candidates(chunk)
+                if len(matrix) and dimension is None:
+                    dimension = matrix.shape[1]
+                if len(matrix) and matrix.shape[1] == dimension:
+                    valid_chunks.append(matrix)
+                    new_indices.append(chunk_indices + offset)
+                offset += len(chunk)
+
+            if valid_chunks:
+                # 预分配缓冲区, 各批次直接写入, 不产生中间拷贝
+                buffer = np.empty((sum(len(m) for m in valid_chunks), dimension), dtype=np.float32)
+                np.concatenate(valid_chunks, axis=0, out=buffer)
+                if method == 'cosine' and not self.assume_normalized:
+                    faiss.normalize_L2(buffer)
+                if index is None:
+                    metric = faiss.METRIC_INNER_PRODUCT if method == 'cosine' else faiss.METRIC_L2
+                    index = faiss.IndexFlat(dimension, metric)
+                index.add(buffer)
+                valid_indices = np.concatenate([valid_indices] + new_indices)
+
+            self._named_faiss_indices[name] = (method, index, valid_indices, offset)
+        return sum(len(m) for m in valid_chunks)
+
+    def search_candidate_index(self, name: str, query_embedding: Union[List[float], np.ndarray],
+                               top_k: int = 5) -> List[Tuple[int, float]]:
+        """
+        Search an index built by build_candidate_index.
 
-    def find_most_similar_sklearn(self, query_embedding: List[float],
-                                 candidate_embeddings: List[List[float]],
+        Args:
+            name: Handle passed to build_candidate_index
+            query_embedding: Query embedding
+            top_k: Number of top results to return
+
+        Returns:
+            List[Tuple[int, float]]: (candidate index, similarity_score) tuples, best first
+        """
+        with self._faiss_lock:
+            entry = self._named_faiss_indices.get(name)
+            if entry is None:
+                raise KeyError(f"No candidate index named '{name}'")
+            _, index, valid_indices, _ = entry
+            return self._search_candidate_rows(index, valid_indices, query_embedding, top_k)
+
+    def find_most_similar_faiss(self, query_embedding: Union[List[float], np.ndarray],
+                               candidate_embeddings: Union[List[List[float]], np.ndarray],
+                               top_k: int = 5,
+                               method: str = 'cosine',
+                               compression: Literal['none', 'fp16', 'pq'] = 'none',
+                               cache_key: Optional[Hashable] = None) -> List[Tuple[int, float]]:
+        """
+        Find the most similar embeddings using FAISS for high-performance similarity search.
+        With a cache_key the index is reused while the same key is passed again; large
+        collections are switched to an approximate index on their first reuse.
+
+        Args:
+            query_embedding: Query embedding
+            candidate_embeddings: Candidate embeddings
+            top_k: Number of top results to return
+            method: Similarity method ('cosine', 'euclidean')
+            compression: How candidates are stored in the index:
+                'none' - float32, exact scores (4 bytes per dimension)
+                'fp16' - half precision, 2x less memory traffic, scores within ~1e-3
+                'pq'   - product quantization, FAISS_PQ_M bytes per vector (up to 32x smaller
+                         than float32 for 1536-d), noticeably lower recall; needs at least
+                         256 candidates to train, otherwise fp16 is used
+            cache_key: Identifies the contents of candidate_embeddings, e.g. (collection name,
+                version); work done for the candidates is reused while the same key is passed
+                again, so change it whenever the candidates change. None disables reuse
+
+        Returns:
+            List[Tuple[int, float]]: List of (index, similarity_score) tuples
+        """
+        index, valid_indices = self._get_or_build_index(candidate_embeddings, method, compression, cache_key)
+        return self._search_candidate_rows(index, valid_indices, query_embedding, top_k)
+
+    def find_most_similar_sklearn(self, query_embedding: Union[List[float], np.ndarray],
+                                 candidate_embeddings: Union[List[List[float]], np.ndarray],
                                  top_k: int = 5,
-                                 method: str = 'cosine') -> List[Tuple[int, float]]:
+                                 method: str = 'cosine',
+                                 cache_key: Optional[Hashable] = None) -> List[Tuple[int, float]]:
         """
-        Find the most similar embeddings using scikit-learn for batch processing.
+        Find the most similar embeddings with a single vectorized scoring pass.
 
         Args:
             query_embedding: Query embedding
             candidate_embeddings: Candidate embeddings
             top_k: Number of top results to return
             method: Similarity method
+            cache_key: Identifies the contents of candidate_embeddings, e.g. (collection name,
+                version); work done for the candidates is reused while the same key is passed
+                again, so change it whenever the candidates change. None disables reuse
 
         Returns:
             List[Tuple[int, float]]: List of (index, similarity_score) tuples
         """
-        if not candidate_embeddings:
-            return []
-            
-        # 过滤空embedding
-        valid_embeddings = []
-        valid_indices = []
-        for i, emb in enumerate(candidate_embeddings):
-            if emb:
-                valid_embeddings.append(emb)
-                valid_indices.append(i)
-        
-        if not valid_embeddings:
+        # 过滤空embedding (同一 cache_key 的矩阵会被复用)
+        embeddings_array, valid_indices = self._stack_candidates(candidate_embeddings, cache_key)
+        if len(embeddings_array) == 0:
             return []
             
-        # 转换为numpy数组
-        embeddings_array = np.array(valid_embeddings, dtype=np.float32)
-        query_array = np.array(query_embedding, dtype=np.float32).reshape(1, -1)
+        # 计算相似度 (余弦/欧氏/曼哈顿为一次向量化计算)
+        similarities = self.score_candidates(query_embedding, embeddings_array, method)
         
-        # 计算相似度矩阵
-        if method == 'cosine':
-            similarities = cosine_similarity(query_array, embeddings_array)[0]
-        elif method == 'euclidean':
-            distances = euclidean_distances(query_array, embeddings_array)[0]
-            similarities = 1 / (1 + distances)
-        else:
-            # 使用自定义方法
-            similarities = []
-            for emb in valid_embeddings:
-                sim = self.calculate_similarity(query_embedding, emb, method)
-                similarities.append(sim)
-            similarities = np.array(similarities)
-        
-        # 获取top_k结果
-        top_indices = np.argsort(similarities)[::-1][:top_k]
-        
-        results = []
-        for idx in top_indices:
-            original_idx = valid_indices[idx]
-            similarity = similarities[idx]
-            results.append((original_idx, similarity))
-        
-        return results
+        # 获取top_k结果 (部分排序, 不对全部候选排序)
+        top_indices = self.top_k_indices(similarities, top_k)
+        return list(zip(valid_indices[top_indices].tolist(), similarities[top_indices].tolist()))
 
-    def find_most_similar(self, query_embedding: List[float],
-                         candidate_embeddings: List[List[float]],
+    def find_most_similar(self, query_embedding: Union[List[float], np.ndarray],
+                         candidate_embeddings: Union[List[List[float]], np.ndarray],
                          top_k: int = 5,
                          method: str = 'cosine',
-                         use_faiss: bool = True) -> List[Tuple[int, float]]:
+                         use_faiss: bool = True,
+                         cache_key: Optional[Hashable] = None) -> List[Tuple[int, float]]:
         """
         Find the most similar embeddings with optimized performance.
 
@@ -320,23 +1122,26 @@ class EmbeddingClient:
             top_k: Number of top results to return
             method: Similarity method
             use_faiss: Whether to use FAISS for acceleration
+            cache_key: Identifies the contents of candidate_embeddings, e.g. (collection name,
+                version); work done for the candidates is reused while the same key is passed
+                again, so change it whenever the candidates change. None disables reuse
 
         Returns:
             List[Tuple[int, float]]: List of (index, similarity_score) tuples
         """
-        if not query_embedding:
+        if len(query_embedding) == 0:
             return []
             
         # 根据数据规模选择算法
         if use_faiss and len(candidate_embeddings) > 100:
             # 大数据集使用FAISS
             return self.find_most_similar_faiss(
-                query_embedding, candidate_embeddings, top_k, method
+                query_embedding, candidate_embeddings, top_k, method, cache_key=cache_key
             )
         else:
             # 小数据集使用sklearn或自定义方法
             return self.find_most_similar_sklearn(
-                query_embedding, candidate_embeddings, top_k, method
+                query_embedding, candidate_embeddings, top_k, method, cache_key
             )
 
     def semantic_search(self, query: str, candidates: List[str],
@@ -358,11 +1163,46 @@ class EmbeddingClient:
         Returns:
             List[Tuple[int, float, str]]: List of (index, similarity_score, text) tuples
         """
-        # Get embeddings
-        query_embedding = self.get_embedding(query, use_cache)
-        candidate_embeddings = self.get_embeddings_batch(candidates, use_cache)
+        # Get embeddings: the query request overlaps with the candidate requests
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            query_future = executor.submit(self.get_embedding, query, use_cache)
+            candidate_embeddings = self.get_embeddings_batch(candidates, use_cache)
+            query_embedding = query_future.result()
+
+        return self._rank_search_results(query_embedding, candidate_embeddings, candidates,
+                                         top_k, method, use_faiss)
 
-        if not query_embedding:
+    async def asemantic_search(self, query: str, candidates: List[str],
+                               top_k: int = 5,
+                               method: str = 'cosine',
+                               use_cache: bool = True,
+                               use_faiss: bool = True) -> List[Tuple[int, float, str]]:
+        """
+        Async version of semantic_search; the query and candidate embeddings are fetched concurrently.
+
+        Args:
+            query: Search query
+            candidates: Candidate texts
+            top_k: Number of top results to return
+            method: Similarity method
+            use_cache: Whether to use embedding cache
+            use_faiss: Whether to use FAISS for acceleration
+
+        Returns:
+            List[Tuple[int, float, str]]: List of (index, similarity_score, text) tuples
+        """
+        query_embedding, candidate_embeddings = await asyncio.gather(
+            self.aget_embedding(query, use_cache),
+            self.aget_embeddings_batch(candidates, use_cache)
+        )
+        return self._rank_search_results(query_embedding, candidate_embeddings, candidates,
+                                         top_k, method, use_faiss)
+
+    def _rank_search_results(self, query_embedding: np.ndarray, candidate_embeddings: np.ndarray,
+                             candidates: List[str], top_k: int, method: str,
+                             use_faiss: bool) -> List[Tuple[int, float, str]]:
+        """Rank embedded candidates against the query and attach the candidate texts."""
+        if query_embedding.size == 0:
             return []
 
         # Find most similar
@@ -394,52 +1234,152 @@ class EmbeddingClient:
         Returns:
             List[List[Tuple[int, float, str]]]: Results for each query
         """
+        if top_k <= 0:
+            return [[] for _ in queries]
+
         # Get embeddings for all queries and candidates
         query_embeddings = self.get_embeddings_batch(queries, use_cache)
         candidate_embeddings = self.get_embeddings_batch(candidates, use_cache)
         
-        if not candidate_embeddings:
+        if candidate_embeddings.size == 0 or query_embeddings.shape[1] != candidate_embeddings.shape[1]:
             return [[] for _ in queries]
         
-        # 转换为numpy数组
-        query_array = np.array(query_embeddings, dtype=np.float32)
-        candidate_array = np.array(candidate_embeddings, dtype=np.float32)
+        # 未能获取embedding的行(NaN)置零, 其相似度在下面统一置为0
+        valid_queries = ~np.isnan(query_embeddings).any(axis=1)
+        valid_candidates = ~np.isnan(candidate_embeddings).any(axis=1)
+        query_array = np.nan_to_num(query_embeddings)
+        candidate_array = np.nan_to_num(candidate_embeddings)
+
+        if method == 'cosine' and top_k <= self.GPU_MAX_TOP_K and self._get_gpu_resources() is not None:
+            # 所有查询一次在GPU上完成搜索, 直接得到top_k的索引与分数
+            return self._gpu_batch_search(query_array, candidate_array, candidates, top_k, valid_queries)
         
         # 计算相似度矩阵
         if method == 'cosine':
-            similarity_matrix = cosine_similarity(query_array, candidate_array)
+            # get_embeddings_batch 返回的都是单位向量, 余弦即一次矩阵乘法
+            similarity_matrix = query_array @ candidate_array.T
         elif method == 'euclidean':
             distance_matrix = euclidean_distances(query_array, candidate_array)
             similarity_matrix = 1 / (1 + distance_matrix)
+        elif method in ('jaccard', 'hamming'):
+            # 候选的符号位只打包一次, 每个查询一次按位运算 + popcount 得到整行
+            candidate_bits = _pack_signs(candidate_array)
+            similarity_matrix = np.stack([
+                _binary_similarity(query_bits, candidate_bits, candidate_array.shape[1], method)
+                for query_bits in _pack_signs(query_array)
+            ]) if len(queries) else np.zeros((0, len(candidates)))
+        elif method == 'pearson' and _pairwise_pearson is not None:
+            # 编译后的并行内核一次填满整个相似度矩阵
+            similarity_matrix = np.empty((len(queries), len(candidates)), dtype=np.float64)
+            _pairwise_pearson(np.ascontiguousarray(query_array, dtype=np.float32),
+                              np.ascontiguousarray(candidate_array, dtype=np.float32),
+                              similarity_matrix)
         else:
             # 使用自定义方法
             similarity_matrix = np.zeros((len(queries), len(candidates)))
-            for i, query_emb in enumerate(query_embeddings):
-                for j, candidate_emb in enumerate(candidate_embeddings):
-                    if query_emb and candidate_emb:
+            for i, query_emb in enumerate(query_array):
+                for j, candidate_emb in enumerate(candidate_array):
+                    if valid_queries[i] and valid_candidates[j]:
                         similarity_matrix[i, j] = self.calculate_similarity(
                             query_emb, candidate_emb, method
                         )
+        similarity_matrix[~valid_queries] = 0
+        similarity_matrix[:, ~valid_candidates] = 0
         
-        # 获取每个查询的top_k结果
-        results = []
-        for i, similarities in enumerate(similarity_matrix):
-            top_indices = np.argsort(similarities)[::-1][:top_k]
-            query_results = []
-            for idx in top_indices:
-                if idx < len(candidates):
-                    query_results.append((idx, similarities[idx], candidates[idx]))
-            results.append(query_results)
+        # 获取每个查询的top_k结果: 按行用argpartition选出top_k, 只对这k个排序
+        k = min(top_k, similarity_matrix.shape[1])
+        if k <= 0:
+            return [[] for _ in queries]
+        if k < similarity_matrix.shape[1]:
+            top_indices = np.argpartition(-similarity_matrix, k - 1, axis=1)[:, :k]
+        else:
+            top_indices = np.broadcast_to(np.arange(k), similarity_matrix.shape)
+        top_scores = np.take_along_axis(similarity_matrix, top_indices, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top_indices = np.take_along_axis(top_indices, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
         
-        return results
+        return [
+            [(idx, score, candidates[idx]) for idx, score in zip(row_indices, row_scores)]
+            for row_indices, row_scores in zip(top_indices.tolist(), top_scores.tolist())
+        ]
+
+    def _gpu_batch_search(self, query_array: np.ndarray, candidate_array: np.ndarray,
+                          candidates: List[str], top_k: int,
+                          valid_queries: np.ndarray) -> List[List[Tuple[int, float, str]]]:
+        """
+        Cosine top_k for every query with one GpuIndexFlatIP search. The candidate index stays on
+        the GPU and is reused while the same candidate texts are searched with the same model;
+        the texts are identified by their count and hash, so no copy of them is kept.
+        Results match the CPU path, including all-zero rows for invalid or zero-norm queries.
+        """
+        k = min(top_k, len(candidates))
+        if k <= 0:
+            return [[] for _ in range(len(query_array))]
+
+        # 字符串的哈希值由Python缓存, 元组哈希只是一次线性组合, 不比较也不保留文本
+        key = (self.model_name, len(candidates), hash(tuple(candidates)))
+        with self._gpu_index_lock:
+            cached = self._gpu_candidate_index
+            if cached is not None and cached[0] == key:
+                gpu_index = cached[1]
+            else:
+                gpu_index = faiss.index_cpu_to_gpu(self._get_gpu_resources(), 0,
+                                                   faiss.IndexFlatIP(candidate_array.shape[1]))
+                # 向量已归一化; 零向量(未能获取embedding的候选)相似度为0
+                gpu_index.add(np.ascontiguousarray(candidate_array, dtype=np.float32))
+                self._gpu_candidate_index = (key, gpu_index)
+            scores, indices = gpu_index.search(np.ascontiguousarray(query_array, dtype=np.float32), k)
+
+        # 与CPU路径一致: 无效或零范数的查询得分全为0, 按候选顺序返回前k个
+        invalid = ~valid_queries | ~np.any(query_array, axis=1)
+        if invalid.any():
+            scores[invalid] = 0
+            indices[invalid] = np.arange(k)
+        return [
+            [(idx, score, candidates[idx]) for idx, score in zip(row_indices, row_scores) if idx != -1]
+            for row_indices, row_scores in zip(indices.tolist(), scores.tolist())
+        ]
 
     def clear_cache(self):
         """Clear the embedding cache."""
-        self._embedding_cache.clear()
+        with self._cache_lock:
+            self._embedding_cache.clear()
+            self._cache_matrix = np.empty((0, 0), dtype=np.float32)
+            self._cache_free_rows = []
+            self._cache_rows_used = 0
 
     def get_cache_stats(self) -> Dict[str, int]:
         """Get cache statistics."""
         return {
             'cache_size': len(self._embedding_cache),
-            'cache_memory_estimate': len(self._embedding_cache) * 1536 * 4  # 假设每个embedding是1536维float32
+            'cache_max_entries': self._cache_max_entries,
+            'cache_ttl': self._cache_ttl,
+            'cache_capacity_rows': self._cache_matrix.shape[0],
+            'cache_free_rows': len(self._cache_free_rows),
+            'cache_memory_estimate': self._cache_matrix.nbytes
         }
+
+
+# 按模型名共享的客户端实例，使各个组件共用同一个embedding缓存
+_shared_clients: Dict[str, EmbeddingClient] = {}
+_shared_clients_lock = threading.Lock()
+
+
+def get_embedding_client(model_name: str = "text-embedding-3-small") -> EmbeddingClient:
+    """
+    Get the process-wide EmbeddingClient for a model, so that the vector DB manager,
+    prompt manager and agents all share one embedding cache.
+
+    Args:
+        model_name (str): OpenAI embedding model name
+
+    Returns:
+        EmbeddingClient: Shared client instance
+    """
+    with _shared_clients_lock:
+        client = _shared_clients.get(model_name)
+        if client is None:
+            client = EmbeddingClient(model_name)
+            _shared_clients[model_name] = client
+        return client
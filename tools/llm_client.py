@@ -1,13 +1,20 @@
 import os
+from typing import Dict, Optional
 from langchain_openai import ChatOpenAI
 
+# Words the validator is allowed to answer with
+VALIDATOR_ANSWERS = ("valid", "invalid")
 
-def setup_llm(model_name: str = "gpt-4o") -> ChatOpenAI:
+
+def setup_llm(model_name: str = "gpt-4o", max_tokens: int = None,
+              logit_bias: Optional[Dict[int, int]] = None) -> ChatOpenAI:
     """
     Initializes and returns the OpenAI LLM.
 
     Args:
         model_name (str): The name of the OpenAI model to use.
+        max_tokens (int): Optional cap on generated tokens.
+        logit_bias (Dict[int, int]): Optional token id -> bias map sent with every request.
 
     Returns:
         ChatOpenAI: An instance of the ChatOpenAI client.
@@ -18,4 +25,40 @@ def setup_llm(model_name: str = "gpt-4o") -> ChatOpenAI:
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise ValueError("FATAL: OPENAI_API_KEY environment variable not set.")
-    return ChatOpenAI(model=model_name, openai_api_key=api_key, temperature=0)
+    return ChatOpenAI(model=model_name, openai_api_key=api_key, temperature=0,
+                      max_tokens=max_tokens, logit_bias=logit_bias)
+
+
+def _answer_logit_bias(model_name: str, bias: int = 20) -> Dict[int, int]:
+    """
+    Builds an OpenAI logit_bias map favouring the single-token encodings of the validator answers.
+    Returns an empty map when the model's tokenizer is unknown.
+    """
+    try:
+        import tiktoken
+        encoding = tiktoken.encoding_for_model(model_name)
+    except Exception as e:
+        print(f"Warning: No tokenizer for {model_name}, validator output is only length-capped. Error: {e}")
+        return {}
+
+    logit_bias = {}
+    for answer in VALIDATOR_ANSWERS:
+        for variant in (answer, f" {answer}"):
+            token_ids = encoding.encode(variant)
+            if len(token_ids) == 1:
+                logit_bias[token_ids[0]] = bias
+    return logit_bias
+
+
+def setup_validator_llm(model_name: str = "gpt-4o-mini") -> ChatOpenAI:
+    """
+    Initializes an LLM for the 'valid'/'invalid' validator: output is capped at a few
+    tokens and biased towards the two answers so decoding stops almost immediately.
+
+    Args:
+        model_name (str): The name of the OpenAI model to use.
+
+    Returns:
+        ChatOpenAI: An instance of the ChatOpenAI client.
+    """
+    return setup_llm(model_name, max_tokens=4, logit_bias=_answer_logit_bias(model_name) or None)
@@ -1,8 +1,20 @@
 import redis
-import json
 import hashlib
-from typing import Optional, Dict, List
+import numpy as np
+from typing import Optional, Dict, List, Tuple, Union
 from datetime import timedelta
+from redis.commands.search.field import TextField, VectorField
+from redis.commands.search.query import Query
+try:
+    from redis.commands.search.index_definition import IndexDefinition, IndexType
+except ImportError:  # redis-py < 6
+    from redis.commands.search.indexDefinition import IndexDefinition, IndexType
+try:
+    import xxhash
+except ImportError:  # optional; keys fall back to SHA-256
+    xxhash = None
+
+from tools.embedding_client import get_embedding_client
 
 
 class RedisCacheClient:
@@ -10,8 +22,11 @@ class RedisCacheClient:
     Redis-based cache client for query results and embeddings.
     """
     
+    # Hash fields returned for a cached query result
+    _RESULT_FIELDS = ('question', 'generated_cypher', 'final_summary', 'similarity_score', 'created_at')
+    
     def __init__(self, host='localhost', port=6379, db=0, password=None, 
-                 default_ttl=3600):  # 1 hour default TTL
+                 default_ttl=3600, embedding_client=None):  # 1 hour default TTL
         """
         Initialize Redis cache client.
         
@@ -21,6 +36,7 @@ class RedisCacheClient:
             db: Redis database number
             password: Redis password
             default_ttl: Default TTL in seconds
+            embedding_client: EmbeddingClient used for semantic lookups (shared client if None)
         """
         self.redis_client = redis.Redis(
             host=host,
@@ -29,20 +45,107 @@ class RedisCacheClient:
             password=password,
             decode_responses=True  # Return strings instead of bytes
         )
+        # Embeddings are stored as raw float32 bytes, so they are read without decoding
+        self.binary_client = redis.Redis(
+            host=host,
+            port=port,
+            db=db,
+            password=password,
+            decode_responses=False
+        )
         self.default_ttl = default_ttl
+        self.embedding_client = embedding_client or get_embedding_client()
+        
+        # Keys are walked with SCAN in batches of this size instead of a blocking KEYS
+        self.SCAN_COUNT = 1000
         
         # Key prefixes for different types of data
-        self.QUERY_CACHE_PREFIX = "query_cache:"
+        # Query results are hashes (question, cypher, summary, float32 'vec') indexed by RediSearch
+        self.QUERY_CACHE_PREFIX = "query_cache_hash:"
+        self.QUERY_CACHE_INDEX = "query_cache_idx"
         self.EMBEDDING_PREFIX = "embedding:"
+        # Format tag of the stored embedding encoding (little-endian float32 bytes)
+        self.EMBEDDING_FORMAT = "f32:"
         self.EXAMPLE_PREFIX = "example:"
         self.FEEDBACK_PREFIX = "feedback:"
+        
+        # None until the vector index has been checked; False when RediSearch is unavailable
+        self._vector_index_ready = None
     
     def _generate_key(self, prefix: str, content: str) -> str:
         """Generate a Redis key from content."""
-        # Use SHA256 for consistent hashing
-        content_hash = hashlib.sha256(content.encode()).hexdigest()
+        # xxh3-128 is a non-cryptographic hash, which is all a cache key needs
+        if xxhash is not None:
+            content_hash = xxhash.xxh3_128_hexdigest(content.encode())
+        else:
+            content_hash = hashlib.sha256(content.encode()).hexdigest()
         return f"{prefix}{content_hash}"
     
+    def _scan_keys(self, pattern: str):
+        """Iterate over keys matching a pattern with SCAN, without blocking the server."""
+        return self.redis_client.scan_iter(match=pattern, count=self.SCAN_COUNT)
+    
+    def _ensure_vector_index(self, dimension: int) -> bool:
+        """
+        Create the RediSearch HNSW index over cached questions on first use.
+        
+        Returns:
+            bool: Whether vector search is available
+        """
+        if self._vector_index_ready is not None:
+            return self._vector_index_ready
+        index = self.redis_client.ft(self.QUERY_CACHE_INDEX)
+        try:
+            index.info()
+            self._vector_index_ready = True
+        except redis.ResponseError:
+            try:
+                index.create_index(
+                    [
+                        TextField("question"),
+                        VectorField("vec", "HNSW", {
+                            "TYPE": "FLOAT32",
+                            "DIM": dimension,
+                            "DISTANCE_METRIC": "COSINE",
+                        }),
+                    ],
+                    definition=IndexDefinition(prefix=[self.QUERY_CACHE_PREFIX], index_type=IndexType.HASH)
+                )
+                self._vector_index_ready = True
+            except redis.ResponseError as e:
+                # Plain Redis without the search module: only exact matches are served
+                print(f"Warning: Redis vector search unavailable: {e}")
+                self._vector_index_ready = False
+        return self._vector_index_ready
+    
+    @staticmethod
+    def _parse_cached_result(fields: Dict, similarity: float) -> Dict:
+        """Convert the string fields of a cached query hash into a result dict."""
+        similarity_score = fields.get('similarity_score')
+        created_at = fields.get('created_at')
+        return {
+            'question': fields.get('question'),
+            'generated_cypher': fields.get('generated_cypher'),
+            'final_summary': fields.get('final_summary'),
+            'similarity_score': float(similarity_score) if similarity_score else None,
+            'created_at': int(created_at) if created_at else None,
+            'similarity': similarity
+        }
+    
+    def _embedding_prefix(self, text_type: str) -> str:
+        """Key prefix of embeddings; the format tag keeps old JSON entries from being misread."""
+        return f"{self.EMBEDDING_PREFIX}{self.EMBEDDING_FORMAT}{text_type}:"
+    
+    @staticmethod
+    def _encode_embedding(embedding_data) -> bytes:
+        """Encode an embedding as contiguous little-endian float32 bytes."""
+        return np.ascontiguousarray(embedding_data, dtype='<f4').tobytes()
+    
+    @staticmethod
+    def _decode_embedding(data: bytes) -> np.ndarray:
+        """Decode bytes written by _encode_embedding without copying."""
+        return np.frombuffer(data, dtype='<f4')
+    
     def cache_query_result(self, question: str, generated_cypher: str, 
                           final_summary: str, similarity_score: float = None,
                           ttl: int = None) -> bool:
@@ -66,23 +169,23 @@ class RedisCacheClient:
                 'question': question,
                 'generated_cypher': generated_cypher,
                 'final_summary': final_summary,
-                'similarity_score': similarity_score,
                 'created_at': self.redis_client.time()[0]  # Unix timestamp
             }
+            if similarity_score is not None:
+                cache_data['similarity_score'] = similarity_score
             
-            # Store as JSON string
-            self.redis_client.setex(
-                key,
-                ttl or self.default_ttl,
-                json.dumps(cache_data)
-            )
+            # The question embedding makes the entry findable by paraphrases
+            embedding = self.embedding_client.get_embedding(question, use_cache=True)
+            if len(embedding) > 0:
+                self._ensure_vector_index(len(embedding))
+                cache_data['vec'] = self._encode_embedding(embedding)
             
-            # Also store in a sorted set for similarity search
-            if similarity_score is not None:
-                self.redis_client.zadd(
-                    f"{self.QUERY_CACHE_PREFIX}similarity",
-                    {key: similarity_score}
-                )
+            # Store as a hash; RediSearch indexes it automatically
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.delete(key)
+            pipe.hset(key, mapping=cache_data)
+            pipe.expire(key, ttl or self.default_ttl)
+            pipe.execute()
             
             return True
             
@@ -104,16 +207,32 @@ class RedisCacheClient:
         try:
             # For exact match
             key = self._generate_key(self.QUERY_CACHE_PREFIX, question)
-            cached_data = self.redis_client.get(key)
+            values = self.redis_client.hmget(key, self._RESULT_FIELDS)
             
-            if cached_data:
-                result = json.loads(cached_data)
-                result['similarity'] = 1.0  # Exact match
-                return result
+            if values[0] is not None:
+                return self._parse_cached_result(dict(zip(self._RESULT_FIELDS, values)), 1.0)
             
-            # For similarity search (would need embedding comparison)
-            # This is a simplified version - in practice you'd need to compare embeddings
-            return None
+            # Nearest cached question by cosine distance (HNSW KNN)
+            embedding = self.embedding_client.get_embedding(question, use_cache=True)
+            if len(embedding) == 0 or not self._ensure_vector_index(len(embedding)):
+                return None
+            
+            query = (
+                Query("*=>[KNN 1 @vec $vec AS distance]")
+                .sort_by("distance")
+                .return_fields(*self._RESULT_FIELDS, "distance")
+                .dialect(2)
+            )
+            docs = self.redis_client.ft(self.QUERY_CACHE_INDEX).search(
+                query, query_params={"vec": self._encode_embedding(embedding)}
+            ).docs
+            if not docs:
+                return None
+            
+            similarity = 1.0 - float(docs[0].distance)
+            if similarity < min_similarity:
+                return None
+            return self._parse_cached_result(docs[0].__dict__, similarity)
             
         except Exception as e:
             print(f"Error finding cached result: {e}")
@@ -132,19 +251,10 @@ class RedisCacheClient:
         """
         try:
             key = self._generate_key(self.QUERY_CACHE_PREFIX, question)
-            cached_data = self.redis_client.get(key)
-            
-            if cached_data:
-                data = json.loads(cached_data)
-                data['final_summary'] = final_summary
-                
-                # Update with same TTL
-                ttl = self.redis_client.ttl(key)
-                if ttl > 0:
-                    self.redis_client.setex(key, ttl, json.dumps(data))
-                else:
-                    self.redis_client.setex(key, self.default_ttl, json.dumps(data))
-                
+            
+            if self.redis_client.exists(key):
+                # HSET keeps the existing TTL
+                self.redis_client.hset(key, 'final_summary', final_summary)
                 return True
             
             return False
@@ -162,10 +272,7 @@ class RedisCacheClient:
         """
         try:
             # Count query cache entries
-            query_keys = self.redis_client.keys(f"{self.QUERY_CACHE_PREFIX}*")
-            query_keys = [k for k in query_keys if not k.endswith(':similarity')]
-            
-            total_entries = len(query_keys)
+            total_entries = sum(1 for _ in self._scan_keys(f"{self.QUERY_CACHE_PREFIX}*"))
             
             # Get memory usage
             info = self.redis_client.info('memory')
@@ -190,19 +297,25 @@ class RedisCacheClient:
         Clear cache entries.
         
         Args:
-            pattern: Key pattern to clear (e.g., "query_cache:*")
+            pattern: Key pattern to clear (e.g., "query_cache_hash:*")
             
         Returns:
             bool: Success status
         """
         try:
-            if pattern:
-                keys = self.redis_client.keys(pattern)
-            else:
-                keys = self.redis_client.keys(f"{self.QUERY_CACHE_PREFIX}*")
+            keys = self._scan_keys(pattern or f"{self.QUERY_CACHE_PREFIX}*")
             
-            if keys:
-                self.redis_client.delete(*keys)
+            # Delete in SCAN_COUNT sized batches, each batch in one round trip
+            pipe = self.redis_client.pipeline(transaction=False)
+            pending = 0
+            for key in keys:
+                pipe.delete(key)
+                pending += 1
+                if pending >= self.SCAN_COUNT:
+                    pipe.execute()
+                    pending = 0
+            if pending:
+                pipe.execute()
             
             return True
             
@@ -211,9 +324,9 @@ class RedisCacheClient:
             return False
     
     def set_embedding(self, text_type: str, text_content: str, 
-                     embedding_data: List[float], ttl: int = None) -> bool:
+                     embedding_data: Union[List[float], np.ndarray], ttl: int = None) -> bool:
         """
-        Store embedding data.
+        Store embedding data as a float32 blob.
         
         Args:
             text_type: Type of text ('example', 'feedback', etc.)
@@ -225,12 +338,12 @@ class RedisCacheClient:
             bool: Success status
         """
         try:
-            key = self._generate_key(f"{self.EMBEDDING_PREFIX}{text_type}:", text_content)
+            key = self._generate_key(self._embedding_prefix(text_type), text_content)
             
-            self.redis_client.setex(
+            self.binary_client.setex(
                 key,
                 ttl or self.default_ttl,
-                json.dumps(embedding_data)
+                self._encode_embedding(embedding_data)
             )
             
             return True
@@ -239,7 +352,7 @@ class RedisCacheClient:
             print(f"Error storing embedding: {e}")
             return False
     
-    def get_embedding(self, text_type: str, text_content: str) -> Optional[List[float]]:
+    def get_embedding(self, text_type: str, text_content: str) -> Optional[np.ndarray]:
         """
         Retrieve embedding data.
         
@@ -248,14 +361,14 @@ class RedisCacheClient:
             text_content: Text content
             
         Returns:
-            Optional[List[float]]: Embedding vector if found
+            Optional[np.ndarray]: (d,) float32 embedding vector (read-only) if found
         """
         try:
-            key = self._generate_key(f"{self.EMBEDDING_PREFIX}{text_type}:", text_content)
-            data = self.redis_client.get(key)
+            key = self._generate_key(self._embedding_prefix(text_type), text_content)
+            data = self.binary_client.get(key)
             
             if data:
-                return json.loads(data)
+                return self._decode_embedding(data)
             
             return None
             
@@ -263,6 +376,59 @@ class RedisCacheClient:
             print(f"Error retrieving embedding: {e}")
             return None
     
+    def set_embeddings_bulk(self, text_type: str, items: List[Tuple[str, Union[List[float], np.ndarray]]],
+                            ttl: int = None) -> bool:
+        """
+        Store many embeddings in a single round trip.
+        
+        Args:
+            text_type: Type of text ('example', 'feedback', etc.)
+            items: (text_content, embedding_data) pairs
+            ttl: Time to live in seconds
+            
+        Returns:
+            bool: Success status
+        """
+        try:
+            prefix = self._embedding_prefix(text_type)
+            pipe = self.binary_client.pipeline(transaction=False)
+            for text_content, embedding_data in items:
+                pipe.setex(
+                    self._generate_key(prefix, text_content),
+                    ttl or self.default_ttl,
+                    self._encode_embedding(embedding_data)
+                )
+            pipe.execute()
+            
+            return True
+            
+        except Exception as e:
+            print(f"Error storing embeddings: {e}")
+            return False
+    
+    def get_embeddings_bulk(self, text_type: str, text_contents: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Retrieve many embeddings with a single MGET.
+        
+        Args:
+            text_type: Type of text
+            text_contents: Text contents
+            
+        Returns:
+            List[Optional[np.ndarray]]: float32 embedding vector per text, None where not cached
+        """
+        if not text_contents:
+            return []
+        try:
+            prefix = self._embedding_prefix(text_type)
+            values = self.binary_client.mget([self._generate_key(prefix, text) for text in text_contents])
+            
+            return [self._decode_embedding(data) if data else None for data in values]
+            
+        except Exception as e:
+            print(f"Error retrieving embeddings: {e}")
+            return [None] * len(text_contents)
+    
     def health_check(self) -> bool:
         """
         Check if Redis connection is healthy.